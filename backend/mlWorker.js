@@ -0,0 +1,104 @@
+// backend/mlWorker.js
+//
+// Client for the persistent Python ML worker (ml/worker.py). One worker
+// process is started lazily and shared by all routes; jobs are sent as
+// newline-delimited JSON and matched to responses by request id.
+
+const { spawn } = require("child_process");
+const path = require("path");
+const readline = require("readline");
+
+const workerScriptPath = path.join(__dirname, "..", "ml", "worker.py");
+const pythonExecutable = process.env.ML_PYTHON || "python";
+const poolSize = process.env.ML_WORKER_POOL || "2";
+
+let workerProcess = null;
+let nextId = 1;
+const pending = new Map();
+
+const failPending = (message) => {
+  for (const { reject, timer } of pending.values()) {
+    clearTimeout(timer);
+    reject(new Error(message));
+  }
+  pending.clear();
+};
+
+const startWorker = () => {
+  const proc = spawn(pythonExecutable, [workerScriptPath, "--stdio", "--workers", poolSize]);
+
+  readline.createInterface({ input: proc.stdout }).on("line", (line) => {
+    let response;
+    try {
+      response = JSON.parse(line);
+    } catch (e) {
+      console.error("ML worker sent invalid JSON:", line);
+      return;
+    }
+    const entry = pending.get(response.id);
+    if (!entry) return;
+    pending.delete(response.id);
+    clearTimeout(entry.timer);
+    if (response.ok) {
+      entry.resolve(response.result);
+    } else {
+      entry.reject(new Error(response.error || "ML worker job failed."));
+    }
+  });
+
+  proc.stderr.on("data", (data) => {
+    console.error("ML worker:", data.toString());
+  });
+
+  proc.on("error", (error) => {
+    console.error("Failed to start ML worker:", error.message);
+  });
+
+  // Writing to a worker that has exited raises EPIPE here; unhandled, it
+  // would take the whole backend down
+  proc.stdin.on("error", (error) => {
+    console.error("ML worker stdin error:", error.message);
+    if (workerProcess === proc) workerProcess = null;
+    failPending("ML worker is not accepting jobs.");
+  });
+
+  proc.on("close", (code) => {
+    console.error(`ML worker exited with code ${code}`);
+    if (workerProcess === proc) workerProcess = null;
+    failPending("ML worker exited before responding.");
+  });
+
+  return proc;
+};
+
+/**
+ * Run a job on the persistent ML worker.
+ * @param {object} job - e.g. { op: "analyze", text } or { op: "ocr", path }.
+ * @param {number} timeoutMs - Client-side timeout; the worker enforces its own per-job timeout too.
+ * @returns {Promise<object>} The job's result object.
+ */
+const runJob = (job, timeoutMs = 35000) => {
+  if (!workerProcess) workerProcess = startWorker();
+
+  const id = String(nextId++);
+  return new Promise((resolve, reject) => {
+    const timer = setTimeout(() => {
+      pending.delete(id);
+      reject(new Error("ML worker timeout: job took too long."));
+    }, timeoutMs);
+
+    if (!workerProcess.stdin.writable) {
+      clearTimeout(timer);
+      workerProcess = null;
+      reject(new Error("ML worker is not accepting jobs."));
+      return;
+    }
+
+    pending.set(id, { resolve, reject, timer });
+    workerProcess.stdin.write(
+      JSON.stringify({ ...job, id, timeout: Math.max(1, Math.floor(timeoutMs / 1000) - 1) }) + "\n"
+    );
+  });
+};
+
+module.exports = { runJob };
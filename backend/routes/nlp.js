@@ -2,12 +2,8 @@
 
 const express = require('express');
 const router = express.Router();
-const { spawn } = require('child_process');
-const path = require('path');
+const { runJob } = require('../mlWorker');
 
-const scriptPath = path.join(__dirname, '..', '..', 'ml', 'nlp', 'reading_analysis.py');
-
-const pythonExecutable = 'python'; 
 router.post('/analyze', (req, res) => {
     const { text } = req.body;
 
@@ -15,35 +11,12 @@ router.post('/analyze', (req, res) => {
         return res.status(400).json({ error: "Missing 'text' field for analysis." });
     }
 
-    
-    const pythonProcess = spawn(pythonExecutable, [scriptPath, text]);
-
-    let pythonOutput = '';
-    let pythonError = '';
-
-    pythonProcess.stdout.on('data', (data) => {
-        pythonOutput += data.toString();
-    });
-
-    pythonProcess.stderr.on('data', (data) => {
-        pythonError += data.toString();
-    });
-
-    pythonProcess.on('close', (code) => {
-        if (code !== 0) {
-            console.error(`Python script exited with code ${code}. Error: ${pythonError}`);
-            return res.status(500).json({ error: 'Failed to run NLP analysis script.', details: pythonError });
-        }
-
-        try {
-            
-            const results = JSON.parse(pythonOutput);
-            res.json(results);
-        } catch (e) {
-            console.error("Failed to parse Python output:", pythonOutput);
-            res.status(500).json({ error: 'Failed to parse NLP results.', rawOutput: pythonOutput });
-        }
-    });
+    runJob({ op: 'analyze', text })
+        .then((results) => res.json(results))
+        .catch((error) => {
+            console.error(`NLP analysis failed: ${error.message}`);
+            res.status(500).json({ error: 'Failed to run NLP analysis.', details: error.message });
+        });
 });
 
-module.exports = router;
\ No newline at end of file
+module.exports = router;
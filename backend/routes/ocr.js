@@ -1,136 +1,86 @@
-
 const express = require("express");
 const router = express.Router();
-const { spawn } = require("child_process");
-const path = require("path");
 const fs = require("fs");
+const { runJob } = require("../mlWorker");
 
 module.exports = (upload) => {
- 
-  const pythonScriptPath = path.join(__dirname, "..", "..", "ml", "ocr", "process_text.py");
-  const pythonExecutable = "py"; 
 
   router.post("/upload", upload.single("image"), (req, res) => {
     console.log("\n=== OCR Upload Request ===");
 
     if (!req.file) {
       console.error(" No file uploaded");
-      return res.status(400).json({ 
-        success: false, 
-        error: "No image file uploaded." 
+      return res.status(400).json({
+        success: false,
+        error: "No image file uploaded."
       });
     }
 
     const filePath = req.file.path;
     console.log(" File saved:", filePath);
-    console.log("Script path:", pythonScriptPath);
-    console.log("Script exists?", fs.existsSync(pythonScriptPath));
-
-    if (!fs.existsSync(pythonScriptPath)) {
-      console.error(" Python script not found!");
-      fs.unlink(filePath, () => {});
-      return res.status(500).json({
-        success: false,
-        error: "OCR script not found on server.",
-        path: pythonScriptPath
-      });
-    }
-
-    const pythonProcess = spawn(pythonExecutable, [pythonScriptPath, filePath]);
-
-    let pythonOutput = "";
-    let pythonError = "";
-    let hasResponded = false;
-    let timeoutHandle = null;
 
     const sendResponse = (statusCode, data) => {
-      if (hasResponded) return;
-      hasResponded = true;
-      
-      if (timeoutHandle) clearTimeout(timeoutHandle);
-      if (pythonProcess && !pythonProcess.killed) {
-        pythonProcess.kill('SIGTERM');
-      }
-      
       fs.unlink(filePath, (err) => {
         if (err) console.error("Failed to delete temp file:", err.message);
       });
-      
+
       if (!res.headersSent) {
         res.status(statusCode).json(data);
       }
     };
 
-    pythonProcess.stdout.on("data", (data) => {
-      const chunk = data.toString();
-      pythonOutput += chunk;
-      console.log("Python output:", chunk);
-    });
-
-    pythonProcess.stderr.on("data", (data) => {
-      const msg = data.toString();
-      pythonError += msg;
-      console.error("Python error:", msg);
-    });
-
-    pythonProcess.on("error", (error) => {
-      console.error("Failed to start Python:", error.message);
-      sendResponse(500, {
-        success: false,
-        error: "Failed to start OCR process. Check if Python is installed.",
-        details: error.message,
-      });
-    });
-
-    pythonProcess.on("close", (code) => {
-      console.log("Python exited with code:", code);
-
-      if (hasResponded) return;
-
-      if (code !== 0) {
-        console.error("Python failed:", pythonError);
-        sendResponse(500, {
+    runJob({ op: "ocr", path: filePath }, 35000)
+      .then((result) => {
+        console.log("OCR Success:", result.success);
+        sendResponse(200, result);
+      })
+      .catch((error) => {
+        console.error("OCR failed:", error.message);
+        const timedOut = /timeout|timed out/i.test(error.message);
+        sendResponse(timedOut ? 504 : 500, {
           success: false,
-          error: "OCR Processing Failed.",
-          details: pythonError || "Unknown error",
+          error: timedOut ? "OCR Timeout: Process took too long." : "OCR Processing Failed.",
+          details: error.message,
         });
-        return;
-      }
+      });
+  });
 
-      try {
-        if (!pythonOutput.trim()) {
-          sendResponse(500, {
-            success: false,
-            error: "No output from Python script.",
-          });
-          return;
-        }
+  // Multi-page scans: several images and/or multi-frame TIFF/PDF files in the
+  // "images" field; pages are OCR'd in parallel and cached by content
+  router.post("/upload-batch", upload.array("images", 50), (req, res) => {
+    if (!req.files || req.files.length === 0) {
+      return res.status(400).json({
+        success: false,
+        error: "No image files uploaded."
+      });
+    }
 
-        const result = JSON.parse(pythonOutput);
-        console.log("OCR Success:", result.success);
-        sendResponse(200, result);
-        
-      } catch (e) {
-        console.error(" Failed to parse JSON:", e.message);
-        console.error("Raw output:", pythonOutput);
-        sendResponse(500, {
-          success: false,
-          error: "Failed to parse OCR results.",
-          raw_output: pythonOutput,
+    const filePaths = req.files.map((file) => file.path);
+    const cleanUp = () => {
+      for (const filePath of filePaths) {
+        fs.unlink(filePath, (err) => {
+          if (err) console.error("Failed to delete temp file:", err.message);
         });
       }
-    });
+    };
 
-    timeoutHandle = setTimeout(() => {
-      if (!hasResponded) {
-        console.error("Timeout after 35 seconds");
-        sendResponse(504, {
+    const tile = req.body.tile === "true" || req.body.tile === "1";
+    runJob({ op: "ocr_batch", paths: filePaths, tile }, 120000)
+      .then((result) => {
+        cleanUp();
+        res.status(result.success ? 200 : 500).json(result);
+      })
+      .catch((error) => {
+        cleanUp();
+        console.error("Batch OCR failed:", error.message);
+        const timedOut = /timeout|timed out/i.test(error.message);
+        res.status(timedOut ? 504 : 500).json({
           success: false,
-          error: "OCR Timeout: Process took too long.",
+          error: timedOut ? "OCR Timeout: Process took too long." : "OCR Processing Failed.",
+          details: error.message,
         });
-      }
-    }, 35000);
+      });
   });
 
   return router;
-};
\ No newline at end of file
+};
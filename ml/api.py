@@ -1,60 +1,106 @@
 # ml/api.py
 
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, g, request, jsonify, send_from_directory, stream_with_context
 from flask_cors import CORS # CRITICAL: Import the CORS extension
+import io
 import sys
 import os
 import json
-import nltk
-
-# --- SETUP NLTK DATA (Must be done before importing NLP modules) ---
-def setup_nltk():
-    """Download and setup required NLTK resources"""
-    required_resources = ['punkt_tab', 'averaged_perceptron_tagger', 'wordnet']
-    
-    for resource in required_resources:
-        try:
-            nltk.data.find(f'tokenizers/{resource}')
-        except LookupError:
-            try:
-                nltk.download(resource, quiet=True)
-                print(f"✓ Downloaded NLTK resource: {resource}")
-            except Exception as e:
-                print(f"⚠ Warning: Could not download {resource}: {e}")
-
-# Call setup before importing NLP modules
-setup_nltk()
+import tempfile
+import time
+from concurrent.futures.process import BrokenProcessPool
 
 # Add the current directory to Python path to find subfolders (nlp, speech, etc.)
 sys.path.append(os.path.abspath(os.path.dirname(__file__)))
 
-# Import the NLP analysis function (from nlp/reading_analysis.py)
-from nlp.reading_analysis import analyze_reading_content 
+import metrics
+import serving
+import startup
+
+# NLTK, Pyphen and the model files are loaded lazily on first use; the
+# warm-up step (see startup.py) triggers that before traffic arrives.
+with startup.timed('import nlp modules'):
+    # Import the NLP analysis function (from nlp/reading_analysis.py)
+    from nlp.reading_analysis import TOKENIZERS, analyze_reading_content, analyze_reading_stream
+    from nlp.batch_analysis import analyze_many, parse_jsonl
+    from nlp.word_prediction_model import get_model, get_next_word_prediction, prediction_count
+    from speech.tts_cache import AUDIO_DIR
 
 app = Flask(__name__)
 CORS(app) # CRITICAL: Initialize CORS to allow cross-origin requests
 PORT = 5050
+# Let a fronting web server (nginx X-Accel / Apache X-Sendfile) stream audio files
+app.use_x_sendfile = os.environ.get('ML_X_SENDFILE', '').lower() in ('1', 'true', 'yes')
+
+# --- Request Metrics and Profiling ---
+metrics.register_gauge('ml_in_flight_requests', "Requests running or queued on the worker pools.", serving.in_flight)
+metrics.register_gauge('ml_draining', "1 while the server drains before shutdown.", serving.is_draining)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    # Opt-in per-request profile: ML_PROFILING=1 plus an X-Profile: 1 header
+    if metrics.PROFILING and request.headers.get('X-Profile') == '1':
+        metrics.begin_profile()
+
+@app.after_request
+def record_request(response):
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.observe('ml_http_request_duration_seconds', time.perf_counter() - g.get('request_started', time.perf_counter()), route=route)
+    metrics.inc('ml_http_requests_total', route=route, method=request.method, status=response.status_code)
+    if metrics.current_profile() is not None:
+        path = metrics.end_profile(f"{int(time.time() * 1000)}-{request.endpoint}")
+        response.headers['X-Profile-File'] = str(path)
+    return response
+
+@app.route('/metrics')
+def metrics_route():
+    """Prometheus scrape endpoint."""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# --- Backpressure and Timeout Responses ---
+@app.errorhandler(serving.Overloaded)
+def overloaded(e):
+    response = jsonify({"success": False, "message": "Server busy, retry shortly."})
+    response.headers['Retry-After'] = str(serving.RETRY_AFTER)
+    return response, 429
+
+@app.errorhandler(serving.Draining)
+def draining(e):
+    response = jsonify({"success": False, "message": "Server is shutting down."})
+    response.headers['Retry-After'] = str(serving.RETRY_AFTER)
+    return response, 503
+
+@app.errorhandler(serving.RequestTimeout)
+def request_timeout(e):
+    return jsonify({"success": False, "message": "Request timed out."}), 504
 
 # --- Core NLP Analysis Endpoint ---
 @app.route('/api/v1/analyze-content', methods=['POST'])
 def analyze_content_route():
     """
     Analyzes content received from the frontend (OCR result or manual text).
+    An optional "tokenizer" ('nltk' or 'fast') overrides ML_TOKENIZER.
     """
     data = request.json
     text_content = data.get('text')
+    tokenizer = data.get('tokenizer')
     
     if not text_content:
         return jsonify({"message": "Missing 'text' parameter for analysis."}), 400
+    if tokenizer is not None and tokenizer not in TOKENIZERS:
+        return jsonify({"message": f"Unknown tokenizer; use one of: {', '.join(TOKENIZERS)}."}), 400
 
     try:
         # Call the function we imported from nlp/reading_analysis.py
-        analysis_results = analyze_reading_content(text_content)
+        analysis_results = serving.run(analyze_reading_content, text_content, tokenizer)
         
         return jsonify({
             "success": True,
             "analysis": analysis_results
         })
+    except (serving.Overloaded, serving.Draining, serving.RequestTimeout):
+        raise
     except Exception as e:
         print(f"Error during NLP analysis: {e}", file=sys.stderr)
         return jsonify({
@@ -62,11 +108,293 @@ def analyze_content_route():
             "message": "Internal error during NLP processing."
         }), 500
 
+# --- Streaming NLP Analysis Endpoint ---
+@app.route('/api/v1/analyze-stream', methods=['POST'])
+def analyze_stream_route():
+    """
+    Streams per-paragraph analysis of a long document as NDJSON.
+    Accepts JSON {"text": ...}, a text file upload in the 'file' form
+    field, or a raw text/plain body (read incrementally).
+    """
+    if 'file' in request.files:
+        source = io.TextIOWrapper(request.files['file'].stream, encoding='utf-8', errors='replace')
+    elif request.mimetype == 'text/plain':
+        source = io.TextIOWrapper(request.stream, encoding='utf-8', errors='replace')
+    else:
+        data = request.get_json(silent=True) or {}
+        source = data.get('text')
+        if not source:
+            return jsonify({"message": "Missing 'text' parameter for analysis."}), 400
+
+    # Analysis runs on this thread while the stream is sent, so it holds an
+    # admission slot until the response is closed (or the client goes away)
+    slot = serving.admit()
+    slot.__enter__()
+
+    def generate():
+        try:
+            for record in analyze_reading_stream(source):
+                yield json.dumps(record) + '\n'
+        except Exception as e:
+            print(f"Error during streaming NLP analysis: {e}", file=sys.stderr)
+            yield json.dumps({"type": "error", "message": "Internal error during NLP processing."}) + '\n'
+
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    response.call_on_close(lambda: slot.__exit__(None, None, None))
+    return response
+
+# --- Batch NLP Analysis Endpoint ---
+def _analyze_batch(items, workers):
+    # Fans out over the server's CPU pool, so a batch shares its CPU_WORKERS
+    # processes with every other request instead of starting more; the
+    # chunks still queued when the request times out are cancelled
+    try:
+        return analyze_many(
+            items,
+            workers=min(workers or serving.CPU_WORKERS, serving.CPU_WORKERS),
+            executor=serving.pool('cpu'),
+            timeout=serving.REQUEST_TIMEOUT,
+        )
+    except BrokenProcessPool:
+        serving.reset_pool('cpu')
+        raise
+
+@app.route('/api/v1/analyze-batch', methods=['POST'])
+def analyze_batch_route():
+    """
+    Analyzes many passages in one request, fanned out over a process pool.
+    Accepts JSON {"texts": [...], "workers": N}, a JSONL upload in the
+    'file' form field, or an application/x-ndjson request body.
+    """
+    workers = request.args.get('workers')
+
+    if 'file' in request.files:
+        items = parse_jsonl(request.files['file'].stream)
+    elif request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        items = parse_jsonl(request.get_data(as_text=True).splitlines())
+    else:
+        data = request.get_json(silent=True) or {}
+        items = data.get('texts')
+        workers = data.get('workers', workers)
+
+    if not isinstance(items, list) or not items:
+        return jsonify({"message": "Provide a non-empty 'texts' list or a JSONL upload."}), 400
+    if workers is not None:
+        try:
+            if isinstance(workers, (bool, float)):
+                raise ValueError()
+            workers = int(workers)
+            if workers < 1:
+                raise ValueError()
+        except (TypeError, ValueError):
+            return jsonify({"message": "'workers' must be a positive integer."}), 400
+
+    try:
+        results = serving.run(_analyze_batch, items, workers, kind='io')
+    except (serving.Overloaded, serving.Draining, serving.RequestTimeout):
+        raise
+    except Exception as e:
+        print(f"Error during batch NLP analysis: {e}", file=sys.stderr)
+        return jsonify({
+            "success": False,
+            "message": "Internal error during batch NLP processing."
+        }), 500
+
+    return jsonify({
+        "success": True,
+        "count": len(results),
+        "failed": sum(1 for r in results if not r["success"]),
+        "results": results
+    })
+
+# --- Word Prediction Endpoint (typing assistance) ---
+@app.route('/api/v1/predict', methods=['POST'])
+def predict_route():
+    """
+    Predicts the next word, or completes the word being typed, for the
+    text typed so far.
+    """
+    data = request.get_json(silent=True) or {}
+    text = data.get('text', '')
+    if not isinstance(text, str):
+        return jsonify({"message": "'text' must be a string."}), 400
+    try:
+        k = prediction_count(data.get('k', 3))
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    if get_model() is None:
+        return jsonify({
+            "success": False,
+            "message": "Word prediction model not trained. Run: python ml/nlp/word_prediction_model.py train"
+        }), 503
+
+    return jsonify({
+        "success": True,
+        "predictions": get_next_word_prediction(text, k=k)
+    })
+
+# --- Streaming Speech-to-Text Endpoint ---
+@app.route('/api/v1/stt-stream', methods=['POST'])
+def stt_stream_route():
+    """
+    Transcribes an uploaded recording ('audio' form field) utterance by
+    utterance, streaming partial transcripts as NDJSON as they complete.
+    """
+    from speech.stt_pipeline import get_recognizer, transcribe_stream
+
+    upload = request.files.get('audio')
+    if upload is None:
+        return jsonify({"message": "No audio file uploaded."}), 400
+
+    try:
+        recognizer = get_recognizer(request.form.get('recognizer'))
+    except Exception as e:
+        return jsonify({"message": f"Speech recognizer unavailable: {e}"}), 400
+
+    # Recognition runs on this thread while the stream is sent, so it holds
+    # an admission slot until the response is closed, like analyze-stream
+    slot = serving.admit()
+    slot.__enter__()
+    try:
+        fd, audio_path = tempfile.mkstemp(suffix='.wav')
+        with os.fdopen(fd, 'wb') as f:
+            upload.save(f)
+    except BaseException:
+        slot.__exit__(None, None, None)
+        raise
+
+    def generate():
+        try:
+            for record in transcribe_stream(audio_path, recognizer):
+                yield json.dumps(record) + '\n'
+        except Exception as e:
+            print(f"Error during streaming STT: {e}", file=sys.stderr)
+            yield json.dumps({"type": "error", "message": "Error processing audio file"}) + '\n'
+
+    def close():
+        # Also runs when the client disconnects before the stream starts
+        os.unlink(audio_path)
+        slot.__exit__(None, None, None)
+
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    response.call_on_close(close)
+    return response
+
+# --- OCR Endpoint ---
+def _ocr_upload(path):
+    from ocr.process_text import extract_text_from_image
+    try:
+        return extract_text_from_image(path)
+    finally:
+        os.unlink(path)
+
+@app.route('/api/v1/ocr', methods=['POST'])
+def ocr_route():
+    """Extracts text from an uploaded image ('image' form field)."""
+    upload = request.files.get('image')
+    if upload is None:
+        return jsonify({"success": False, "error": "No image file uploaded."}), 400
+
+    fd, image_path = tempfile.mkstemp(suffix=os.path.splitext(upload.filename or '')[1])
+    with os.fdopen(fd, 'wb') as f:
+        upload.save(f)
+    try:
+        result = serving.run(_ocr_upload, image_path, kind='io')
+    except (serving.Overloaded, serving.Draining):
+        # The job never started, so it will not clean up its upload
+        os.unlink(image_path)
+        raise
+    return jsonify(result), 200 if result.get("success") else 500
+
+def _ocr_batch_upload(paths, tile):
+    from ocr.batch_ocr import ocr_documents
+    try:
+        return ocr_documents(paths, tile=tile)
+    finally:
+        for path in paths:
+            os.unlink(path)
+
+@app.route('/api/v1/ocr-batch', methods=['POST'])
+def ocr_batch_route():
+    """
+    OCRs several uploaded images or multi-page TIFF/PDF files ('images'
+    form field, optional tile=1) page by page, with per-page timings.
+    """
+    uploads = request.files.getlist('images')
+    if not uploads:
+        return jsonify({"success": False, "error": "No image files uploaded."}), 400
+
+    paths = []
+    for upload in uploads:
+        fd, path = tempfile.mkstemp(suffix=os.path.splitext(upload.filename or '')[1])
+        with os.fdopen(fd, 'wb') as f:
+            upload.save(f)
+        paths.append(path)
+    tile = request.form.get('tile', '').lower() in ('1', 'true', 'yes')
+    try:
+        result = serving.run(_ocr_batch_upload, paths, tile, kind='io')
+    except (serving.Overloaded, serving.Draining):
+        # The job never started, so it will not clean up its uploads
+        for path in paths:
+            os.unlink(path)
+        raise
+    return jsonify(result), 200 if result.get("success") else 500
+
+# --- Text-to-Speech Endpoint ---
+def _synthesize(text, lang, voice):
+    from speech.tts_cache import get_cache
+    return get_cache().synthesize(text, lang, voice)
+
+@app.route('/api/v1/tts', methods=['POST'])
+def tts_route():
+    """Returns the URL of a (cached) audio clip for the given text."""
+    data = request.get_json(silent=True) or {}
+    text = data.get('text')
+    if not text:
+        return jsonify({"message": "Missing 'text' parameter for TTS."}), 400
+
+    try:
+        filename = serving.run(_synthesize, text, data.get('lang', 'en'), data.get('voice'), kind='io')
+    except (serving.Overloaded, serving.Draining, serving.RequestTimeout):
+        raise
+    except Exception as e:
+        print(f"Error generating TTS: {e}", file=sys.stderr)
+        return jsonify({"success": False, "error": "TTS failed during generation."}), 500
+    return jsonify({"success": True, "audioUrl": f"/audio/{filename}"})
+
+# --- Health and Readiness Probes ---
+@app.route('/healthz')
+def healthz():
+    """Liveness: the process is up and serving requests."""
+    return jsonify({"status": "ok"})
+
+@app.route('/readyz')
+def readyz():
+    """Readiness: warm-up finished and required NLTK resources are present."""
+    details = startup.readiness()
+    details["draining"] = serving.is_draining()
+    details["in_flight"] = serving.in_flight()
+    details["startup"] = startup.startup_report()
+    ready = details["ready"] and not details["draining"]
+    return jsonify(details), 200 if ready else 503
+
 # --- Serve Static Audio Files (Required for TTS playback) ---
 @app.route('/audio/<filename>')
 def serve_audio(filename):
-    return send_from_directory('audio_temp', filename) 
+    # Clips are content-addressed, so they never change under the same name:
+    # let clients cache them and answer conditional / Range requests cheaply.
+    response = send_from_directory(AUDIO_DIR, filename, conditional=True, max_age=30 * 24 * 3600)
+    response.cache_control.immutable = True
+    return response
 
 if __name__ == '__main__':
+    # ML_WARMUP=sync blocks until warm, 'background' serves /healthz meanwhile
+    warmup_mode = os.environ.get('ML_WARMUP', 'background')
+    # With debug=True the reloader re-runs this script in a child process that
+    # serves the requests; only that child (WERKZEUG_RUN_MAIN set) warms up,
+    # not the parent that just watches files
+    if warmup_mode != 'off' and os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        startup.start_warm_up(background=warmup_mode != 'sync')
     print(f"🚀 ML Service running on http://localhost:{PORT}")
     app.run(port=PORT, debug=True)
\ No newline at end of file
@@ -0,0 +1,461 @@
+# ml/bench.py
+"""
+Benchmarks for the ML hot paths, with a regression check.
+
+Passages come from a deterministic generator (fixed seed) at several
+sizes and reading levels, so runs on the same machine are comparable.
+Each case reports latency percentiles, throughput and peak traced memory.
+
+    python ml/bench.py run [--quick] [--only analyze,tts] [--out results.json]
+    python ml/bench.py run --save-baseline          # store as the baseline
+    python ml/bench.py compare [BASELINE] [RESULTS] [--threshold 0.2]
+    python ml/bench.py passage --size page --level hard
+
+`compare` exits non-zero when a case's p50 latency or peak memory grew by
+more than the threshold, so an optimization can be accepted (or rejected)
+against a baseline recorded on the same machine before the change.
+
+Optional pieces are skipped, not failed: OCR recognition needs the
+Tesseract binary (preprocessing is always measured), and TTS/STT use the
+offline local tone backend and stub recognizer.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import struct
+import sys
+import tempfile
+import time
+import tracemalloc
+import wave
+from pathlib import Path
+
+# Allow running as a script: make the ml/ directory importable
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+RESULTS_DIR = Path(os.environ.get('ML_BENCH_DIR', Path(__file__).resolve().parent / 'bench_results'))
+BASELINE_PATH = RESULTS_DIR / 'baseline.json'
+LATEST_PATH = RESULTS_DIR / 'latest.json'
+DEFAULT_THRESHOLD = 0.20
+# Changes smaller than these are timer / allocator noise, never regressions
+NOISE_FLOOR = {"p50_ms": 0.05, "peak_mem_kb": 4.0}
+SEED = 1234
+
+# Passage sizes in words
+SIZES = {
+    'sentence': 15,
+    'paragraph': 120,
+    'page': 500,
+    'chapter': 5000,
+}
+
+
+# --- Synthetic Passages ---
+LEVEL_WORDS = {
+    'easy': (
+        "the a cat dog sun run big red we see it is on in at and to go can play "
+        "home day look fun book sit hat top mom dad tree bird fish good time little "
+        "come jump"
+    ).split(),
+    'medium': (
+        "people water window garden morning yellow animal picture family teacher "
+        "happy number river answer question market evening country finger pocket "
+        "letter simple listen travel kitchen reason doctor basket winter"
+    ).split(),
+    'hard': (
+        "physiological mechanism comprehension phonological environment "
+        "extraordinary responsibility circumstances interpretation "
+        "communication vocabulary intervention neurological development "
+        "characteristic approximately significantly consideration "
+        "accommodation experimental psychological assessment"
+    ).split(),
+}
+# Share of words drawn from each tier per reading level (easy, medium, hard)
+LEVEL_MIX = {
+    'easy': (0.85, 0.15, 0.0),
+    'medium': (0.55, 0.35, 0.10),
+    'hard': (0.40, 0.30, 0.30),
+}
+
+
+def generate_passage(words, level='medium', seed=SEED):
+    """
+    A deterministic passage of about `words` words: sentences of 6-20
+    words, paragraphs of 3-7 sentences separated by blank lines.
+    """
+    rng = random.Random(f"{seed}:{words}:{level}")
+    tiers = [LEVEL_WORDS['easy'], LEVEL_WORDS['medium'], LEVEL_WORDS['hard']]
+    weights = LEVEL_MIX[level]
+    paragraphs = []
+    sentences = []
+    total = 0
+    while total < words:
+        length = min(rng.randint(6, 20), words - total)
+        picked = [rng.choice(rng.choices(tiers, weights)[0]) for _ in range(max(1, length))]
+        if len(picked) > 4 and rng.random() < 0.3:
+            picked[len(picked) // 2] += ','
+        sentence = ' '.join(picked)
+        sentences.append(sentence[0].upper() + sentence[1:] + rng.choice('...?!'))
+        total += len(picked)
+        if len(sentences) >= rng.randint(3, 7):
+            paragraphs.append(' '.join(sentences))
+            sentences = []
+    if sentences:
+        paragraphs.append(' '.join(sentences))
+    return '\n\n'.join(paragraphs)
+
+
+PREFIXES = ('', 'un', 're', 'pre', 'mis', 'over', 'under', 'non')
+SUFFIXES = ('', 's', 'ed', 'ing', 'er', 'ly', 'ness', 'ment', 'ful', 'less', 'able')
+
+
+def generate_vocabulary(count, seed=SEED):
+    """
+    `count` distinct word forms (prefix + tier word + suffix) in a
+    deterministic shuffled order, for benchmarks that must miss caches.
+    """
+    stems = [word for tier in LEVEL_WORDS.values() for word in tier]
+    forms = sorted({prefix + stem + suffix for prefix in PREFIXES for stem in stems for suffix in SUFFIXES})
+    random.Random(f"{seed}:vocabulary").shuffle(forms)
+    return forms[:count]
+
+
+def _tone_wav(path, utterances=3, sample_rate=16000):
+    """Write a WAV with `utterances` tone bursts separated by silence."""
+    frames = bytearray()
+    for i in range(utterances):
+        frequency = 220 + 40 * i
+        for n in range(sample_rate):
+            frames += struct.pack('<h', int(6000 * math.sin(2 * math.pi * frequency * n / sample_rate)))
+        frames += bytes(2 * sample_rate * 6 // 10)
+    with wave.open(str(path), 'wb') as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(sample_rate)
+        out.writeframes(bytes(frames))
+
+
+def _text_image(text, width=1200):
+    """Render black text on a white page, about 60 characters per line."""
+    from PIL import Image, ImageDraw
+    words = text.split()
+    lines = [' '.join(words[i:i + 10]) for i in range(0, len(words), 10)]
+    image = Image.new('L', (width, 40 + 24 * len(lines)), 255)
+    draw = ImageDraw.Draw(image)
+    for row, line in enumerate(lines):
+        draw.text((20, 20 + 24 * row), line, fill=0)
+    return image
+
+
+# --- Measurement ---
+def measure(fn, items=1, unit='calls', min_iterations=5, min_seconds=0.5, max_iterations=1000):
+    """
+    Time repeated calls of `fn()` after one warm-up call. `items` is the
+    amount of work per call (words, passages, ...) used for throughput.
+    Peak memory is measured on a separate traced call so tracing does not
+    skew the latencies.
+    """
+    fn()
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < max_iterations and (
+        len(timings) < min_iterations or time.perf_counter() - started < min_seconds
+    ):
+        call_started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - call_started)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    timings.sort()
+    mean = sum(timings) / len(timings)
+    return {
+        "iterations": len(timings),
+        "p50_ms": round(timings[len(timings) // 2] * 1000, 4),
+        "p99_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1000, 4),
+        "mean_ms": round(mean * 1000, 4),
+        "throughput": round(items / mean, 2) if mean else None,
+        "unit": f"{unit}/s",
+        "peak_mem_kb": round(peak / 1024, 1),
+    }
+
+
+# --- Cases ---
+def bench_tokenize(quick):
+    from nlp.fast_tokenizer import iter_words
+    from nlp.reading_analysis import word_tokenize
+    results = {}
+    for size in ('paragraph', 'page') if quick else SIZES:
+        text = generate_passage(SIZES[size])
+        results[f"tokenize.{size}"] = measure(lambda: word_tokenize(text), SIZES[size], 'words')
+        results[f"tokenize.{size}.fast"] = measure(lambda: list(iter_words(text)), SIZES[size], 'words')
+    return results
+
+
+def bench_syllables(quick):
+    from nlp.syllables import clear_caches, count_syllables
+    # Distinct words with the caches (ours and Pyphen's) emptied per run, so
+    # every cold lookup goes to the lexicon or Pyphen's patterns; the warm
+    # run repeats the same words, so every lookup hits the LRU cache
+    words = generate_vocabulary(1000 if quick else 5000)
+
+    def cold():
+        clear_caches()
+        for word in words:
+            count_syllables(word)
+
+    def warm():
+        for word in words:
+            count_syllables(word)
+
+    return {
+        "syllables.cold": measure(cold, len(words), 'words'),
+        "syllables.warm": measure(warm, len(words), 'words'),
+    }
+
+
+def bench_analyze(quick):
+    from nlp.reading_analysis import analyze_reading_content
+    results = {}
+    sizes = ('sentence', 'paragraph', 'page') if quick else SIZES
+    for size in sizes:
+        for level in ('easy', 'hard') if quick else LEVEL_MIX:
+            text = generate_passage(SIZES[size], level)
+            results[f"analyze.{size}.{level}"] = measure(
+                lambda: analyze_reading_content(text, tokenizer='nltk'), SIZES[size], 'words'
+            )
+            results[f"analyze.{size}.{level}.fast"] = measure(
+                lambda: analyze_reading_content(text, tokenizer='fast'), SIZES[size], 'words'
+            )
+    return results
+
+
+def bench_batch(quick):
+    from nlp.batch_analysis import analyze_many
+    count = 32 if quick else 200
+    texts = [generate_passage(SIZES['paragraph'], 'medium', seed=i) for i in range(count)]
+    workers = min(4, os.cpu_count() or 1)
+    # Pool start-up happens in the warm-up call, so this is steady-state throughput
+    return {
+        f"batch.paragraphs.w{workers}": measure(
+            lambda: analyze_many(texts, workers=workers), count, 'passages', min_iterations=3
+        ),
+    }
+
+
+def bench_ocr(quick):
+    try:
+        from ocr.batch_ocr import preprocess
+        from ocr.process_text import tesseract_available
+        image = _text_image(generate_passage(SIZES['page']))
+    except ImportError as e:
+        return {"ocr": {"skipped": f"Missing dependency: {e}"}}
+
+    results = {"ocr.preprocess.page": measure(lambda: preprocess(image), 1, 'pages', min_iterations=3)}
+    if tesseract_available():
+        import pytesseract
+        page = preprocess(image)
+        results["ocr.tesseract.page"] = measure(
+            lambda: pytesseract.image_to_string(page), 1, 'pages', min_iterations=3, min_seconds=0
+        )
+    else:
+        results["ocr.tesseract.page"] = {"skipped": "Tesseract not installed"}
+    return results
+
+
+def bench_tts(quick):
+    from speech.tts_cache import LocalToneBackend, TTSCache
+    words = sorted(set(generate_passage(SIZES['paragraph'], 'hard').lower().replace(',', ' ').split()))
+    with tempfile.TemporaryDirectory() as directory:
+        cache = TTSCache(directory, backend=LocalToneBackend())
+        counter = iter(range(10 ** 9))
+
+        def miss():
+            cache.synthesize(f"{words[0]} {next(counter)}")
+
+        def hit():
+            cache.synthesize(words[0])
+
+        return {
+            # A fixed count keeps the growing cache index comparable between runs
+            "tts.local.miss": measure(miss, 1, 'clips', min_iterations=50, min_seconds=0),
+            "tts.local.hit": measure(hit, 1, 'clips'),
+        }
+
+
+def bench_stt(quick):
+    from speech.stt_pipeline import StubRecognizer, transcribe
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / 'speech.wav'
+        utterances = 3 if quick else 10
+        _tone_wav(path, utterances)
+        seconds = utterances * 1.6
+        # Throughput assumes every burst is transcribed; a VAD miss would hide as a speed-up
+        segments = transcribe(path, StubRecognizer())["segments"]
+        if segments != utterances:
+            raise RuntimeError(f"VAD found {segments} of {utterances} utterances")
+        return {
+            f"stt.stub.{utterances}utt": measure(
+                lambda: transcribe(path, StubRecognizer()), seconds, 'audio-seconds', min_iterations=3
+            ),
+        }
+
+
+CASES = {
+    'tokenize': bench_tokenize,
+    'syllables': bench_syllables,
+    'analyze': bench_analyze,
+    'batch': bench_batch,
+    'ocr': bench_ocr,
+    'tts': bench_tts,
+    'stt': bench_stt,
+}
+
+
+def run(only=None, quick=False):
+    """Run the selected benchmark groups and return the results document."""
+    results = {}
+    for name, bench in CASES.items():
+        if only and name not in only:
+            continue
+        print(f"⏱ {name}...", file=sys.stderr)
+        try:
+            results.update(bench(quick))
+        except Exception as e:
+            results[name] = {"error": f"{type(e).__name__}: {e}"}
+    try:
+        import resource
+        max_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except ImportError:
+        max_rss_kb = None
+    return {
+        "meta": {
+            "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "quick": quick,
+            "seed": SEED,
+            "max_rss_kb": max_rss_kb,
+        },
+        "results": results,
+    }
+
+
+# --- Regression Check ---
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare two results documents. Returns (rows, regressions, missing):
+    a row per case measured in both, the cases whose p50 latency or peak
+    memory grew by more than `threshold` (a fraction) and by more than the
+    metric's NOISE_FLOOR, and (case, reason) for baseline cases that were
+    not measured this time (their group failed, or they were skipped).
+    """
+    rows = []
+    regressions = []
+    missing = []
+    for name, old in sorted(baseline["results"].items()):
+        if "p50_ms" not in old:
+            continue
+        new = current["results"].get(name)
+        if new is None:
+            group = current["results"].get(name.split('.')[0], {})
+            missing.append((name, group.get("error") or "not in results"))
+            continue
+        if "p50_ms" not in new:
+            missing.append((name, new.get("error") or new.get("skipped") or "not measured"))
+            continue
+        row = {"case": name}
+        for metric in ("p50_ms", "peak_mem_kb"):
+            before, after = old[metric], new[metric]
+            change = (after - before) / before if before else 0.0
+            row[metric] = (before, after, change)
+            if change > threshold and after - before > NOISE_FLOOR[metric]:
+                regressions.append((name, metric, before, after, change))
+        rows.append(row)
+    return rows, regressions, missing
+
+
+def _load(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write(document, path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(document, f, indent=2)
+    print(f"✓ Wrote {path}", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the ML hot paths.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="Run the benchmarks.")
+    run_parser.add_argument('--only', default='', help=f"Comma-separated groups: {','.join(CASES)}")
+    run_parser.add_argument('--quick', action='store_true', help="Smaller sizes and fewer cases.")
+    run_parser.add_argument('--out', default=str(LATEST_PATH))
+    run_parser.add_argument('--save-baseline', action='store_true', help=f"Also write {BASELINE_PATH}.")
+
+    compare_parser = commands.add_parser('compare', help="Fail if RESULTS regressed against BASELINE.")
+    compare_parser.add_argument('baseline', nargs='?', default=str(BASELINE_PATH))
+    compare_parser.add_argument('results', nargs='?', default=str(LATEST_PATH))
+    compare_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                                help="Allowed relative increase, e.g. 0.2 for 20%%.")
+
+    passage_parser = commands.add_parser('passage', help="Print a generated passage.")
+    passage_parser.add_argument('--size', choices=SIZES, default='paragraph')
+    passage_parser.add_argument('--level', choices=LEVEL_MIX, default='medium')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'passage':
+        print(generate_passage(SIZES[args.size], args.level))
+        return 0
+
+    if args.command == 'run':
+        only = {name.strip() for name in args.only.split(',') if name.strip()}
+        document = run(only, args.quick)
+        _write(document, args.out)
+        if args.save_baseline:
+            _write(document, BASELINE_PATH)
+        for name, result in document["results"].items():
+            if "p50_ms" in result:
+                print(f"{name:32} p50 {result['p50_ms']:>10.3f} ms  p99 {result['p99_ms']:>10.3f} ms  "
+                      f"{result['throughput']:>12} {result['unit']}  peak {result['peak_mem_kb']} KB")
+            else:
+                print(f"{name:32} {result.get('skipped') or result.get('error')}")
+        return 0
+
+    rows, regressions, missing = compare(_load(args.baseline), _load(args.results), args.threshold)
+    for row in rows:
+        before, after, change = row["p50_ms"]
+        mem_before, mem_after, mem_change = row["peak_mem_kb"]
+        print(f"{row['case']:32} p50 {before:>10.3f} -> {after:>10.3f} ms ({change:+.1%})  "
+              f"peak {mem_before} -> {mem_after} KB ({mem_change:+.1%})")
+    if missing:
+        print(f"\n✗ {len(missing)} baseline case(s) not measured:")
+        for name, reason in missing:
+            print(f"  {name}: {reason}")
+    if regressions:
+        print(f"\n✗ {len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+        for name, metric, before, after, change in regressions:
+            print(f"  {name} {metric}: {before} -> {after} ({change:+.1%})")
+    if missing or regressions:
+        return 1
+    print(f"\n✓ No regressions beyond {args.threshold:.0%} across {len(rows)} cases")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,300 @@
+# ml/metrics.py
+"""
+Lightweight latency instrumentation for the ML service.
+
+Stages are wrapped in `span('analyze.tokenize')` blocks; each span feeds a
+fixed-bucket latency histogram, so recording costs two clock reads and a
+bisect. Counters track outcomes (cache hits, failed OCR, ...). Everything
+renders as Prometheus text for the /metrics route. Set ML_METRICS=0 to
+turn recording off.
+
+Work run on the serving process pool records into the child's registry;
+`collect()` hands that back with the result so the parent can `merge()` it.
+
+The sampling profiler is opt-in (ML_PROFILING=1). A profiled request is
+sampled every few milliseconds and written as collapsed stacks
+("frame;frame;frame count"), the input format of flamegraph.pl and
+speedscope.
+"""
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+ENABLED = os.environ.get('ML_METRICS', '1').lower() not in ('0', 'false', 'no')
+PROFILING = os.environ.get('ML_PROFILING', '').lower() in ('1', 'true', 'yes')
+PROFILE_DIR = Path(os.environ.get('ML_PROFILE_DIR', Path(__file__).resolve().parent / 'profiles'))
+PROFILE_INTERVAL = float(os.environ.get('ML_PROFILE_INTERVAL', 0.005))
+
+# Upper bounds in seconds; the last bucket (+Inf) is implicit
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+METRIC_HELP = {
+    'ml_stage_duration_seconds': ('histogram', "Time spent in each processing stage."),
+    'ml_http_request_duration_seconds': ('histogram', "HTTP request latency by route."),
+    'ml_http_requests_total': ('counter', "HTTP requests by route and status."),
+    'ml_ocr_requests_total': ('counter', "OCR calls by outcome."),
+    'ml_tts_cache_requests_total': ('counter', "TTS cache lookups by result."),
+    'ml_stt_segments_total': ('counter', "Transcribed speech segments by outcome."),
+    'ml_syllable_cache_requests_total': ('counter', "Syllable LRU cache lookups by result."),
+    'ml_syllable_lookups_total': ('counter', "Syllable cache misses by the source that answered them."),
+}
+
+_lock = threading.Lock()
+_histograms = {}   # (name, labels) -> [bucket counts..., +Inf count, sum]
+_counters = {}     # (name, labels) -> value
+_gauges = {}       # name -> (help, callable)
+_collectors = []   # callables run before each snapshot
+
+
+# --- Recording ---
+def _labels(labels):
+    return tuple(sorted(labels.items()))
+
+
+def observe(name, seconds, **labels):
+    """Record one latency sample in histogram `name`."""
+    if not ENABLED:
+        return
+    key = (name, _labels(labels))
+    index = bisect_left(BUCKETS, seconds)
+    with _lock:
+        values = _histograms.get(key)
+        if values is None:
+            values = _histograms[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+        values[index] += 1
+        values[-1] += seconds
+
+
+def inc(name, amount=1, **labels):
+    """Increment counter `name`."""
+    if not ENABLED:
+        return
+    key = (name, _labels(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+@contextmanager
+def span(stage):
+    """Time a block of work as `stage` in ml_stage_duration_seconds."""
+    if not ENABLED:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe('ml_stage_duration_seconds', time.perf_counter() - started, stage=stage)
+
+
+def register_gauge(name, help_text, read):
+    """Expose `read()` as a gauge, evaluated at scrape time."""
+    _gauges[name] = (help_text, read)
+
+
+def register_collector(collect_fn):
+    """
+    Run `collect_fn()` before every snapshot, for modules that keep their
+    own counters and report them here with `inc()`.
+    """
+    _collectors.append(collect_fn)
+
+
+def snapshot(reset=False):
+    """A picklable copy of the recorded metrics (optionally clearing them)."""
+    if ENABLED:
+        for collect_fn in _collectors:
+            collect_fn()
+    with _lock:
+        data = {
+            "histograms": {key: list(values) for key, values in _histograms.items()},
+            "counters": dict(_counters),
+        }
+        if reset:
+            _histograms.clear()
+            _counters.clear()
+    return data
+
+
+def merge(data):
+    """Add a snapshot taken in another process to this registry."""
+    with _lock:
+        for key, values in data["histograms"].items():
+            mine = _histograms.get(key)
+            if mine is None:
+                _histograms[key] = list(values)
+            else:
+                for i, value in enumerate(values):
+                    mine[i] += value
+        for key, value in data["counters"].items():
+            _counters[key] = _counters.get(key, 0) + value
+
+
+def collect(fn, args, profile=False):
+    """
+    Run `fn(*args)` in a pool process and return (result, metrics, stacks):
+    the metrics it recorded and, when `profile` is set, its sampled stacks.
+    """
+    if not profile:
+        result = fn(*args)
+        return result, snapshot(reset=True), None
+
+    profiler = Profile()
+    profiler.start()
+    try:
+        with profiler.attach():
+            result = fn(*args)
+    finally:
+        profiler.stop()
+    return result, snapshot(reset=True), dict(profiler.stacks)
+
+
+# --- Prometheus Exposition ---
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def _header(lines, name, kind, help_text):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    data = snapshot()
+    lines = []
+
+    histograms = sorted(data["histograms"].items())
+    for name in sorted({name for (name, _), _ in histograms}):
+        kind, help_text = METRIC_HELP.get(name, ('histogram', name))
+        _header(lines, name, kind, help_text)
+        for (metric, labels), values in histograms:
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ('+Inf',), values):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {values[-1]:.6f}")
+            lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+
+    counters = sorted(data["counters"].items())
+    for name in sorted({name for (name, _), _ in counters}):
+        kind, help_text = METRIC_HELP.get(name, ('counter', name))
+        _header(lines, name, kind, help_text)
+        for (metric, labels), value in counters:
+            if metric == name:
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+
+    for name, (help_text, read) in sorted(_gauges.items()):
+        try:
+            value = read()
+        except Exception:
+            continue
+        _header(lines, name, 'gauge', help_text)
+        lines.append(f"{name} {float(value)}")
+
+    return '\n'.join(lines) + '\n'
+
+
+# --- Sampling Profiler ---
+_local = threading.local()
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class Profile:
+    """
+    Samples the stacks of the attached threads on a background thread.
+    Only attached threads are sampled, so the cost is confined to the
+    profiled request.
+    """
+
+    def __init__(self, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self._threads = set()
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def start(self):
+        self._sampler = threading.Thread(target=self._run, name='ml-profiler', daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+
+    @contextmanager
+    def attach(self):
+        """Sample the calling thread until the block exits."""
+        ident = threading.get_ident()
+        self._threads.add(ident)
+        try:
+            yield
+        finally:
+            self._threads.discard(ident)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for ident in list(self._threads):
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame))
+                    frame = frame.f_back
+                if stack:
+                    self.stacks[';'.join(reversed(stack))] += 1
+
+    def merge(self, stacks):
+        self.stacks.update(stacks or {})
+
+    def dump(self, name):
+        """Write the collapsed stacks to PROFILE_DIR/<name>.folded."""
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        path = PROFILE_DIR / f"{name}.folded"
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+
+def current_profile():
+    """The profile of the request being handled on this thread, if any."""
+    return getattr(_local, 'profile', None)
+
+
+def begin_profile():
+    """Start profiling the calling thread (a request handler)."""
+    profile = Profile()
+    profile.start()
+    profile._threads.add(threading.get_ident())
+    _local.profile = profile
+    return profile
+
+
+def end_profile(name):
+    """Stop the calling thread's profile and dump it; returns the file path."""
+    profile = current_profile()
+    if profile is None:
+        return None
+    _local.profile = None
+    profile.stop()
+    return profile.dump(name)
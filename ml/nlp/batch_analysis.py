@@ -0,0 +1,152 @@
+# ml/nlp/batch_analysis.py
+"""
+Batch reading analysis over a process pool.
+
+Used to pre-score a reading library: passages are dispatched in chunks to
+worker processes and results come back in input order. A failing passage
+is reported in its own slot without failing the rest of the batch.
+"""
+import atexit
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Allow running as a script: make the ml/ directory importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nlp.reading_analysis import analyze_reading_content
+
+# Upper bound on batch parallelism, whatever the caller asks for
+MAX_WORKERS = max(1, int(os.environ.get('ML_BATCH_MAX_WORKERS', os.cpu_count() or 1)))
+
+# Process pools are expensive to start, so one pool of MAX_WORKERS is shared
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=MAX_WORKERS, mp_context=multiprocessing.get_context('spawn')
+        )
+    return _executor
+
+
+@atexit.register
+def shutdown_executors():
+    """Shut down the process pool started by analyze_many."""
+    global _executor
+    if _executor is not None:
+        executor, _executor = _executor, None
+        executor.shutdown(cancel_futures=True)
+
+
+def _analyze_one(item):
+    """Analyze one batch item (a string, or a dict with 'text' and optional 'id')."""
+    result = {}
+    if isinstance(item, dict):
+        if item.get('id') is not None:
+            result['id'] = item['id']
+        if item.get('error'):
+            return {**result, "success": False, "error": item['error']}
+        text = item.get('text')
+    else:
+        text = item
+
+    if not isinstance(text, str):
+        return {**result, "success": False, "error": f"Expected a text string, got {type(text).__name__}."}
+
+    try:
+        return {**result, "success": True, "analysis": analyze_reading_content(text)}
+    except Exception as e:
+        return {**result, "success": False, "error": str(e)}
+
+
+def _analyze_chunk(items):
+    return [_analyze_one(item) for item in items]
+
+
+def analyze_many(texts, workers=None, chunksize=None, executor=None, timeout=None):
+    """
+    Analyze many passages in parallel, returning results in input order.
+
+    Each result is {"success": True, "analysis": {...}} or
+    {"success": False, "error": "..."}; items given as dicts keep their 'id'.
+    At most `workers` (capped at MAX_WORKERS) processes of the shared pool
+    work on the batch at once. A caller-owned `executor` (the API server's
+    CPU pool) is used instead of that pool, and after `timeout` seconds the
+    unfinished chunks are cancelled and concurrent.futures.TimeoutError raised.
+    """
+    global _executor
+    items = list(texts)
+    workers = min(max(1, int(workers or MAX_WORKERS)), MAX_WORKERS)
+
+    if executor is None and (workers == 1 or len(items) < 2):
+        return _analyze_chunk(items)
+
+    if chunksize is None:
+        # A few chunks per worker keeps IPC overhead low while still balancing load
+        chunksize = max(1, len(items) // (workers * 4))
+
+    own_executor = executor is None
+    if own_executor:
+        executor = _get_executor()
+    deadline = None if timeout is None else time.monotonic() + timeout
+
+    def next_result():
+        remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+        chunk_results = in_flight[0].result(timeout=remaining)
+        in_flight.popleft()
+        return chunk_results
+
+    results = []
+    in_flight = deque()
+    try:
+        # Keeping at most `workers` chunks submitted bounds the processes this batch occupies
+        for start in range(0, len(items), chunksize):
+            if len(in_flight) >= workers:
+                results.extend(next_result())
+            in_flight.append(executor.submit(_analyze_chunk, items[start:start + chunksize]))
+        while in_flight:
+            results.extend(next_result())
+    except BrokenProcessPool:
+        # A worker process died; start a fresh pool for the next batch
+        if own_executor:
+            _executor = None
+        raise
+    finally:
+        for future in in_flight:
+            future.cancel()
+    return results
+
+
+def parse_jsonl(lines):
+    """
+    Parse JSONL batch input. Each line is a JSON string or an object with
+    'text' (and optional 'id'). Invalid lines become error items so they
+    keep their position in the results.
+    """
+    items = []
+    for line_number, line in enumerate(lines, start=1):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        if not line.strip():
+            continue
+        try:
+            items.append(json.loads(line))
+        except ValueError as e:
+            items.append({"error": f"Invalid JSON on line {line_number}: {e}"})
+    return items
+
+
+if __name__ == '__main__':
+    # CLI Mode: python ml/nlp/batch_analysis.py passages.jsonl [workers]
+    with open(sys.argv[1], encoding='utf-8') as f:
+        batch = parse_jsonl(f)
+    for entry in analyze_many(batch, workers=int(sys.argv[2]) if len(sys.argv) > 2 else None):
+        print(json.dumps(entry))
@@ -0,0 +1,280 @@
+# ml/nlp/fast_tokenizer.py
+"""
+Single-pass word scanner for the fused ("fast") analysis path.
+
+The reading analysis keeps only the alphabetic tokens of
+nltk.word_tokenize. This scanner yields exactly those tokens, in order,
+without running Punkt sentence splitting and the Treebank regex cascade
+over the whole text. Each whitespace-separated chunk is handled by one
+of three paths:
+
+- plain words, by far the common case, are yielded as they are
+- words with simple surrounding punctuation ("(word", "word,", 'word."')
+  are matched by one regex; for a final period, the same decision
+  Punkt would make is taken, consulting the Punkt model only for
+  abbreviations and initials
+- the rare remaining chunks (apostrophes, hyphens, digits, inner
+  punctuation) go through NLTK's own Treebank tokenizer one chunk at a
+  time
+
+Treebank's output depends on where Punkt ends sentences, including the
+closing quotes and brackets Punkt moves back into a sentence, even from
+the next chunk ('end. "'). Those decisions are reproduced around each
+chunk, and the differential check below guards the equivalence.
+
+Check the scanner against nltk.word_tokenize on the built-in corpus,
+generated passages and any text files:
+
+    python ml/nlp/fast_tokenizer.py check [FILE ...]
+"""
+import os
+import re
+import sys
+import threading
+
+# Allow running as a script: make the ml/ directory importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_CHUNK_RE = re.compile(r'\S+')
+# A word with only split-off punctuation around it; group 2 is a final
+# period, which Treebank splits off only at the end of a sentence
+_SIMPLE_RE = re.compile(r"""[("\[{“‘«]*([^\W\d_]+)(?:[,;:!?")\]}”’»]*|(\.)[")\]}”’»]*)""")
+# Characters Punkt does not let a word start with
+_PUNKT_NON_START = '("`{[:;&#*@)}]-,'
+# Plain words Treebank splits (MacIntyre contractions), with the split position
+_SPLIT_WORDS = {'cannot': 3, 'gimme': 3, 'gonna': 3, 'gotta': 3, 'lemme': 3, 'wanna': 3}
+
+_load_lock = threading.Lock()
+_punkt = None
+_treebank = None
+_abbreviations = frozenset()
+# Characters after . ? ! that still let Punkt break there (set from the installed Punkt)
+_after_break = frozenset()
+# Punkt's pattern for closing punctuation it moves back to the sentence it closes
+_realign_re = None
+
+
+def _load_nltk():
+    """Load the Punkt model and Treebank tokenizer word_tokenize uses."""
+    global _punkt, _treebank, _abbreviations, _after_break, _realign_re
+    if _punkt is not None:
+        return
+    with _load_lock:
+        if _punkt is not None:
+            return
+        from nltk.tokenize.destructive import NLTKWordTokenizer
+        from nltk.tokenize.punkt import PunktLanguageVars, PunktTokenizer
+
+        language_vars = PunktLanguageVars()
+        context_re = language_vars.period_context_re()
+        candidates = '!"#$%&\'()*+,-./:;<=>?@[\\]^_`{|}~‘’“”«»'
+        _after_break = frozenset(c for c in candidates if context_re.match('.' + c))
+        _realign_re = language_vars.re_boundary_realignment
+        _treebank = NLTKWordTokenizer()
+        punkt = PunktTokenizer('english')
+        _abbreviations = frozenset(punkt._params.abbrev_types)
+        # Set last: other threads skip the lock once _punkt is set
+        _punkt = punkt
+
+
+def _plain(word):
+    split = _SPLIT_WORDS.get(word.lower())
+    if split is None:
+        yield word
+    else:
+        yield word[:split]
+        yield word[split:]
+
+
+def _is_break_candidate(chunk, i, following):
+    """Does Punkt consider a sentence break after chunk[i] (one of . ? !)?"""
+    if i + 1 < len(chunk):
+        return chunk[i + 1] in _after_break
+    return following is not None
+
+
+def _sentence_break(chunk, i, following):
+    """Punkt's decision for the break candidate at chunk[i]."""
+    if chunk[i] != '.':
+        return True
+    word = chunk[:i].lstrip(_PUNKT_NON_START)
+    if len(word) > 1 and word.isalpha() and word.lower() not in _abbreviations:
+        # Punkt always breaks after a plain word that is not an abbreviation
+        return True
+    after = chunk[i + 1] if i + 1 < len(chunk) else ' ' + following
+    return _punkt.text_contains_sentbreak(chunk[:i + 1] + after)
+
+
+def _realigned(start):
+    """How many leading characters of `start` (a sentence's first chunk) Punkt moves back."""
+    match = _realign_re.match(start + ' ')
+    return len(match.group().rstrip()) if match else 0
+
+
+def _chunk_words(chunk, following, separator):
+    """
+    Alphabetic tokens of one chunk. `following` is the next chunk (None
+    for the last one) and `separator` the whitespace between them.
+    """
+    _load_nltk()
+    simple = _SIMPLE_RE.fullmatch(chunk)
+    if simple and simple.group(1).isalpha():
+        period = simple.start(2)
+        if period == -1 or following is None:
+            yield from _plain(simple.group(1))
+            return
+        # A period ending the chunk before bare closing quotes ('end. "') needs the full path
+        if period != len(chunk) - 1 or not _realigned(following):
+            if _is_break_candidate(chunk, period, following) and _sentence_break(chunk, period, following):
+                yield from _plain(simple.group(1))
+            return
+
+    # (text, ends a sentence) pieces; Punkt weighs only the last break candidate in a chunk
+    parts = [(chunk, following is None)]
+    for i in range(len(chunk) - 1, -1, -1):
+        if chunk[i] in '.?!' and _is_break_candidate(chunk, i, following):
+            if _sentence_break(chunk, i, following):
+                end = i + 1
+                if end < len(chunk):
+                    # Punkt moves closing quotes and brackets back to the sentence they close
+                    end += _realigned(chunk[end:])
+                    parts = [(chunk[:end], True), (chunk[end:], following is None)]
+                elif following is not None and _realigned(following):
+                    # ... even when they are the next chunk, which then holds no words
+                    parts = [(chunk + separator + following[:_realigned(following)], True)]
+                else:
+                    # Break at the very end, e.g. "you,Mr." (Punkt does not see the abbreviation)
+                    parts = [(chunk, True)]
+            break
+
+    for part, sentence_end in parts:
+        if part:
+            if not sentence_end:
+                # A sentinel token stops Treebank applying its sentence-end rules;
+                # its "' " rule needs the real whitespace, not just any
+                part += (separator if part[-1] == "'" else ' ') + '|'
+            for token in _treebank.tokenize(part):
+                if token.isalpha():
+                    yield token
+
+
+def iter_words(text, stop=None):
+    """
+    Yield the alphabetic tokens nltk.word_tokenize would produce for
+    `text`, scanning it once. With `stop`, only chunks starting before
+    that offset are tokenized (the rest still serves as their context).
+    """
+    chunks = _CHUNK_RE.finditer(text)
+    current = next(chunks, None)
+    if stop is None:
+        stop = len(text)
+    while current is not None and current.start() < stop:
+        following = next(chunks, None)
+        chunk = current.group()
+        if chunk.isalpha():
+            # Inlined _plain(): this branch handles nearly every word
+            split = _SPLIT_WORDS.get(chunk.lower())
+            if split is None:
+                yield chunk
+            else:
+                yield chunk[:split]
+                yield chunk[split:]
+        elif following is None:
+            yield from _chunk_words(chunk, None, '')
+        else:
+            yield from _chunk_words(chunk, following.group(), text[current.end():following.start()])
+        current = following
+
+
+# --- Differential Check ---
+DIFFERENTIAL_CORPUS = [
+    "The physiological mechanisms of dyslexia are complex.",
+    "Don't worry, we'll read it together. She's sure it's John's book, isn't it?",
+    "I can't believe you cannot see it! Gonna try, gotta go, wanna come? Lemme see.",
+    "\"Stop!\" he shouted. 'Why?' she asked, and then -- quietly -- left...",
+    "Mr. Smith met Dr. Jones at 3:30 p.m. on Jan. 5, 2021; they paid $4.50 (roughly).",
+    "Well-known authors, e.g. Dahl, wrote 100s of stories; some are co-written.",
+    "The children’s teacher said “reading aloud helps” — and it’s true.",
+    "Rock'n'roll, o'clock and y'all stay together; 'em and 'twas do not.",
+    "Phonological awareness (the ability to hear sounds) predicts reading [1].",
+    "Question marks?! Ellipses... and #hashtags, @mentions & 50% off *today*.",
+    "Ends with a quote.\" Then another sentence begins.) And brackets close.]",
+    "Émile read Les Misérables; Zoë preferred naïve café poetry.",
+    "Words/slashes and under_scores and numbers like 3rd or 4th are skipped.",
+    "The dogs' bowls were empty. The cats' toys were everywhere, weren't they?",
+    "I'M SHOUTING, DON'T YOU SEE? WE'LL STOP NOW.",
+    "More'n enough. D'ye hear? Gimme that, said the teacher: quietly.",
+    "Line one\nline two.\nLine three: a colon,a comma and semi;colons.",
+    # Spaced-out quotes, common in OCR output
+    'The end. " Next chapter begins here.',
+    'He met Mr. Smith at noon. " Hello , " he said .',
+    'Dr. " Jones " arrived.',
+    "It ended. ” So did the next one. ) And this. '' Then more.",
+    "It's over'\nthey said. \" -- and then \"--left.",
+    # Abbreviations glued to the preceding punctuation, also common in OCR output
+    "Thank you,Mr. Smith, for coming.",
+    "Yes,Dr. Brown agreed.",
+    "He left;Mrs. Lee stayed.",
+    "A list:Mr. Jones",
+]
+
+
+def _nltk_words(text):
+    from nlp.reading_analysis import word_tokenize
+    return [w for w in word_tokenize(text) if w.isalpha()]
+
+
+def differential_check(texts):
+    """
+    Compare the scanner and the two analysis paths with NLTK on `texts`.
+    Returns a list of mismatch descriptions (empty when they agree).
+    """
+    from nlp.reading_analysis import analyze_reading_content
+
+    mismatches = []
+    for index, text in enumerate(texts):
+        expected = _nltk_words(text)
+        actual = list(iter_words(text))
+        if expected != actual:
+            position = next(
+                (i for i, (a, b) in enumerate(zip(expected, actual)) if a != b),
+                min(len(expected), len(actual)),
+            )
+            mismatches.append(
+                f"text {index}: tokens differ at {position}: "
+                f"nltk {expected[position:position + 3]} vs fast {actual[position:position + 3]}"
+            )
+            continue
+        reference = analyze_reading_content(text, tokenizer='nltk')
+        fused = analyze_reading_content(text, tokenizer='fast')
+        if reference != fused:
+            mismatches.append(f"text {index}: analysis differs: {reference} vs {fused}")
+    return mismatches
+
+
+def _corpus(files):
+    from bench import LEVEL_MIX, SIZES, generate_passage
+    texts = list(DIFFERENTIAL_CORPUS)
+    for size in SIZES:
+        for level in LEVEL_MIX:
+            texts.append(generate_passage(SIZES[size], level))
+    for path in files:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            # Compare paragraph by paragraph, the granularity the analysis uses
+            from nlp.reading_analysis import iter_chunks
+            texts.extend(iter_chunks(f))
+    return texts
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'check':
+        texts = _corpus(sys.argv[2:])
+        mismatches = differential_check(texts)
+        for mismatch in mismatches:
+            print(f"✗ {mismatch}")
+        if mismatches:
+            print(f"✗ {len(mismatches)} of {len(texts)} texts differ from NLTK")
+            sys.exit(1)
+        print(f"✓ Fast tokenizer matches NLTK on {len(texts)} texts")
+    else:
+        print("Usage: python ml/nlp/fast_tokenizer.py check [FILE ...]")
@@ -1,17 +1,39 @@
 # ml/nlp/reading_analysis.py
+import heapq
 import json
+import os
 import sys
-import nltk
-import pyphen
 
-# Ensure nltk data is present
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt', quiet=True)
+# Allow running as a script: make the ml/ directory importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# Initialize Pyphen for syllable counting (English)
-dic = pyphen.Pyphen(lang='en')
+from metrics import span
+from nlp.fast_tokenizer import iter_words
+from nlp.syllables import count_syllables
+from nlp.word_rarity import challenge_score, is_rare
+
+_nltk_word_tokenize = None
+_punkt = None
+
+def word_tokenize(text, preserve_line=False):
+    """nltk.word_tokenize, importing NLTK on first use (it is slow to import)."""
+    global _nltk_word_tokenize
+    if _nltk_word_tokenize is None:
+        from nltk import word_tokenize as _nltk_word_tokenize
+    return _nltk_word_tokenize(text, preserve_line=preserve_line)
+
+def sentence_spans(text):
+    """(start, end) offsets of the sentences nltk.sent_tokenize finds in `text`."""
+    global _punkt
+    if _punkt is None:
+        from nltk.tokenize.punkt import PunktTokenizer
+        _punkt = PunktTokenizer('english')
+    return list(_punkt.span_tokenize(text))
+
+# Tokenizer used when none is given per call: 'nltk' (reference) or 'fast'
+# (fused single-pass scanner, see nlp/fast_tokenizer.py)
+TOKENIZER = os.environ.get('ML_TOKENIZER', 'nltk')
+TOKENIZERS = ('nltk', 'fast')
 
 # Common easy words to ignore even if they have syllables
 EASY_WORDS = set([
@@ -19,61 +41,243 @@ EASY_WORDS = set([
     'experience', 'something', 'different', 'important', 'the', 'and', 'that', 'have', 'for'
 ])
 
-def count_syllables(word):
-    """Count syllables in a word using Pyphen."""
-    return len(dic.inserted(word).split('-'))
+# Maximum number of challenging words returned per analysis
+MAX_CHALLENGING_WORDS = 15
+
+def is_challenging(clean_word, syllables):
+    """
+    Words with > 2 syllables or > 7 chars that aren't in the common list,
+    OR words that are rare according to the word-frequency index.
+    """
+    if clean_word in EASY_WORDS:
+        return False
+    return syllables > 2 or len(clean_word) > 7 or (len(clean_word) > 3 and is_rare(clean_word))
+
+def select_challenging_words(candidates, k=MAX_CHALLENGING_WORDS):
+    """
+    Pick the top-k candidates by challenge score. `candidates` maps each
+    lowercase word to (score, first_position, surface_form); ties go to
+    the word seen first, so the selection is deterministic.
+    """
+    top = heapq.nlargest(k, candidates.values(), key=lambda c: (c[0], -c[1]))
+    return [surface for _, _, surface in top]
+
+def difficulty_from_counts(total_words, total_syllables):
+    """Flesch-Kincaid based difficulty, normalized to 0..1."""
+    if total_words > 0:
+        score = 206.835 - 1.015 * (total_words) - 84.6 * (total_syllables / total_words)
+        return max(0.0, min(1.0, (100 - score) / 100))
+    return 0.0
+
+# Paragraphs longer than this are flushed at the next line break so a
+# document without blank lines still streams in bounded chunks
+MAX_CHUNK_CHARS = 20000
+
+def _iter_lines(text):
+    start = 0
+    while start < len(text):
+        end = text.find('\n', start)
+        end = len(text) if end == -1 else end + 1
+        yield text[start:end]
+        start = end
+
+def iter_chunks(source):
+    """
+    Lazily split a string, file or iterable of lines into paragraph chunks.
+    """
+    lines = _iter_lines(source) if isinstance(source, str) else source
+    buffer = []
+    size = 0
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        if line.strip():
+            buffer.append(line)
+            size += len(line)
+            if size < MAX_CHUNK_CHARS:
+                continue
+        if buffer:
+            yield ''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer)
+
+def _last_word_start(text):
+    """Offset of the last whitespace-separated chunk of `text`."""
+    end = len(text.rstrip())
+    start = end
+    while start and not text[start - 1].isspace():
+        start -= 1
+    return start
+
+class ReadingAccumulator:
+    """
+    Running word, syllable and candidate totals for one document, fed one
+    chunk at a time. Both the streaming and the one-shot analysis use it.
+
+    How the end of a chunk tokenizes depends on the text after it (Punkt
+    may or may not end a sentence there), so the last sentence ('nltk')
+    or word ('fast') is held back until the next chunk arrives. Chunked
+    analysis therefore counts exactly what word_tokenize finds in the
+    whole document; only a held tail longer than MAX_CHUNK_CHARS is
+    analyzed without waiting.
+    """
+
+    def __init__(self, tokenizer=None):
+        self.tokenizer = tokenizer or TOKENIZER
+        if self.tokenizer not in TOKENIZERS:
+            raise ValueError(f"Unknown tokenizer: {self.tokenizer!r}")
+        self.total_words = 0
+        self.total_syllables = 0
+        self.candidates = {}
+        # Tail of the text so far whose tokens depend on what follows it
+        self._held = ''
+
+    def add_text(self, text, final=False):
+        """
+        Add a chunk of text (`final` for the last one); returns the
+        challenging words of the text analyzed by this call.
+        """
+        text = self._held + text
+        self._held = ''
+        if self.tokenizer == 'fast':
+            return self._add_text_fused(text, final)
+        with span('analyze.tokenize'):
+            if final:
+                words = word_tokenize(text)
+            else:
+                spans = sentence_spans(text)
+                held_start = spans[-1][0] if spans else len(text)
+                if len(text) - held_start > MAX_CHUNK_CHARS:
+                    held_start = len(text)
+                self._held = text[held_start:]
+                words = [
+                    token
+                    for start, end in spans if start < held_start
+                    for token in word_tokenize(text[start:end], preserve_line=True)
+                ]
+            # Filter for actual alphabetic words
+            words = [w for w in words if w.isalpha()]
+        with span('analyze.syllables'):
+            lowered = [word.lower() for word in words]
+            counts = [count_syllables(word) for word in lowered]
+        chunk_words = {}
+
+        with span('analyze.scoring'):
+            for word, clean_word, syllables in zip(words, lowered, counts):
+                self.total_syllables += syllables
+
+                if is_challenging(clean_word, syllables):
+                    chunk_words.setdefault(clean_word, word)
+                    if clean_word not in self.candidates:
+                        self.candidates[clean_word] = (
+                            challenge_score(clean_word, syllables), self.total_words, word
+                        )
+                self.total_words += 1
+
+        return list(chunk_words.values())
+
+    def _add_text_fused(self, text, final):
+        """
+        add_text in one pass: scan, filter, lowercase, syllabify and
+        collect candidates per word, without intermediate token lists.
+        """
+        stop = None
+        if not final:
+            stop = _last_word_start(text)
+            if len(text) - stop > MAX_CHUNK_CHARS:
+                stop = None
+            else:
+                self._held = text[stop:]
+        chunk_words = {}
+        candidates = self.candidates
+        total_words = self.total_words
+        total_syllables = self.total_syllables
 
-def analyze_reading_content(text):
+        with span('analyze.fused'):
+            for word in iter_words(text, stop):
+                clean_word = word.lower()
+                syllables = count_syllables(clean_word)
+                total_syllables += syllables
+
+                if is_challenging(clean_word, syllables):
+                    chunk_words.setdefault(clean_word, word)
+                    if clean_word not in candidates:
+                        candidates[clean_word] = (
+                            challenge_score(clean_word, syllables), total_words, word
+                        )
+                total_words += 1
+
+        self.total_words = total_words
+        self.total_syllables = total_syllables
+        return list(chunk_words.values())
+
+    def finish(self):
+        """Analyze the held-back tail once no more text will arrive."""
+        return self.add_text('', final=True)
+
+    def difficulty(self):
+        return round(difficulty_from_counts(self.total_words, self.total_syllables), 2)
+
+    def stats(self):
+        return {
+            "total_words": self.total_words,
+            "syllable_count": self.total_syllables
+        }
+
+    def result(self):
+        return {
+            "challenging_words": select_challenging_words(self.candidates),
+            "difficulty_score": self.difficulty(),
+            "stats": self.stats()
+        }
+
+def analyze_reading_content(text, tokenizer=None):
     """
     Advanced NLP analysis for Dyslexia assistance.
     Identifies words based on syllable count (3+) and rarity.
+    `tokenizer` overrides ML_TOKENIZER ('nltk' or 'fast') for this call.
     """
     if not text:
         return {"challenging_words": [], "difficulty_score": 0.0}
     
-    words = nltk.word_tokenize(text)
-    # Filter for actual alphabetic words
-    words = [w for w in words if w.isalpha()]
-    total_words = len(words)
-    
-    difficult_candidates = []
-    total_syllables = 0
-
-    for word in words:
-        clean_word = word.lower()
-        syllables = count_syllables(clean_word)
-        total_syllables += syllables
-        
-        # Logic: Words with > 2 syllables that aren't in the common list
-        # OR words that are long (> 7 chars)
-        if (syllables > 2 or len(clean_word) > 7) and clean_word not in EASY_WORDS:
-            difficult_candidates.append(word) 
-
-    # Get unique difficult words, limited to top 15
-    unique_difficult_words = list(set(difficult_candidates))[:15]
-
-    # --- Calculate Flesch-Kincaid Readability Score ---
-    if total_words > 0:
-        score = 206.835 - 1.015 * (total_words) - 84.6 * (total_syllables / total_words)
-        normalized_difficulty = max(0.0, min(1.0, (100 - score) / 100))
-    else:
-        normalized_difficulty = 0.0
-
-    return {
-        "challenging_words": unique_difficult_words,
-        "difficulty_score": round(normalized_difficulty, 2),
-        "stats": {
-            "total_words": total_words,
-            "syllable_count": total_syllables
+    with span('analyze.total'):
+        accumulator = ReadingAccumulator(tokenizer)
+        for chunk in iter_chunks(text):
+            accumulator.add_text(chunk)
+        accumulator.finish()
+        return accumulator.result()
+
+def analyze_reading_stream(source, tokenizer=None):
+    """
+    Streaming variant of analyze_reading_content for long documents.
+
+    Yields one {"type": "chunk", ...} record per paragraph with that
+    chunk's challenging words and the running difficulty, then a final
+    {"type": "result", "analysis": ...} record equal to the one-shot result.
+    """
+    accumulator = ReadingAccumulator(tokenizer)
+    chunks = iter_chunks(source)
+    chunk = next(chunks, None)
+    index = 0
+    while chunk is not None:
+        # Look ahead one chunk so the last record includes the held-back tail
+        following = next(chunks, None)
+        yield {
+            "type": "chunk",
+            "index": index,
+            "challenging_words": accumulator.add_text(chunk, final=following is None),
+            "difficulty_score": accumulator.difficulty(),
+            "stats": accumulator.stats()
         }
-    }
+        chunk = following
+        index += 1
+    yield {"type": "result", "analysis": accumulator.result()}
 
 if __name__ == '__main__':
-    # CLI Mode
-    if len(sys.argv) > 1:
-        input_text = sys.argv[1]
-        results = analyze_reading_content(input_text)
-        print(json.dumps(results))
-    else:
-        # Test default
-        print(json.dumps(analyze_reading_content("The physiological mechanisms of dyslexia are complex.")))
\ No newline at end of file
+    # CLI Mode: thin wrapper around the persistent worker's job handler
+    from worker import run_job
+
+    input_text = sys.argv[1] if len(sys.argv) > 1 else "The physiological mechanisms of dyslexia are complex."
+    print(json.dumps(run_job({"op": "analyze", "text": input_text})))
@@ -0,0 +1,146 @@
+# ml/nlp/syllables.py
+"""
+Syllable lookup with an in-process LRU cache and a prebuilt lexicon.
+
+Lookup order: LRU cache -> memory-mapped lexicon file -> Pyphen.
+Build the lexicon from a word list (one or more words per line):
+
+    python ml/nlp/syllables.py build wordlist.txt [ml/nlp/models/syllables.lex]
+"""
+import os
+import sys
+from functools import lru_cache
+from pathlib import Path
+
+# Allow running as a script: make the ml/ directory importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics
+from nlp.word_table import WordTable, build_table
+
+LEXICON_PATH = Path(os.environ.get(
+    'SYLLABLE_LEXICON', Path(__file__).resolve().parent / 'models' / 'syllables.lex'
+))
+CACHE_SIZE = int(os.environ.get('SYLLABLE_CACHE_SIZE', 65536))
+
+_dic = None
+_lexicon = None
+_lexicon_checked = False
+_counters = {"lexicon_hits": 0, "pyphen_fallbacks": 0}
+# Values of the counters last reported to metrics
+_reported = {"cache_hits": 0, "cache_misses": 0, "lexicon_hits": 0, "pyphen_fallbacks": 0}
+
+
+def _get_dic():
+    global _dic
+    if _dic is None:
+        import pyphen
+        _dic = pyphen.Pyphen(lang='en')
+    return _dic
+
+
+def _get_lexicon():
+    global _lexicon, _lexicon_checked
+    if not _lexicon_checked:
+        _lexicon_checked = True
+        if LEXICON_PATH.exists():
+            try:
+                _lexicon = WordTable(str(LEXICON_PATH))
+            except (OSError, ValueError) as e:
+                print(f"⚠ Warning: Could not load syllable lexicon: {e}", file=sys.stderr)
+    return _lexicon
+
+
+def preload():
+    """Load the Pyphen dictionary and the lexicon file ahead of first use."""
+    _get_dic()
+    _get_lexicon()
+
+
+def pyphen_syllables(word):
+    """Count syllables in a word using Pyphen."""
+    return len(_get_dic().inserted(word).split('-'))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def count_syllables(word):
+    """Count syllables in a word, consulting the lexicon before Pyphen."""
+    lexicon = _get_lexicon()
+    if lexicon is not None:
+        count = lexicon.get(word)
+        if count is not None:
+            _counters["lexicon_hits"] += 1
+            return count
+    _counters["pyphen_fallbacks"] += 1
+    return pyphen_syllables(word)
+
+
+def clear_caches():
+    """Empty the LRU cache and Pyphen's per-word cache (for cold benchmarks)."""
+    count_syllables.cache_clear()
+    if _dic is not None:
+        _dic.hd.cache.clear()
+
+
+def cache_stats():
+    """Hit/miss counters for sizing the LRU cache and the lexicon."""
+    info = count_syllables.cache_info()
+    lexicon = _get_lexicon()
+    return {
+        "cache_hits": info.hits,
+        "cache_misses": info.misses,
+        "cache_size": info.currsize,
+        "cache_maxsize": info.maxsize,
+        "lexicon_hits": _counters["lexicon_hits"],
+        "pyphen_fallbacks": _counters["pyphen_fallbacks"],
+        "lexicon_words": len(lexicon) if lexicon is not None else 0,
+    }
+
+
+def _report_metrics():
+    """Add the counter increments since the last report to metrics."""
+    info = count_syllables.cache_info()
+    current = {
+        "cache_hits": info.hits,
+        "cache_misses": info.misses,
+        "lexicon_hits": _counters["lexicon_hits"],
+        "pyphen_fallbacks": _counters["pyphen_fallbacks"],
+    }
+    for key, value in current.items():
+        # cache_clear() resets the LRU counters
+        delta = value - _reported[key] if value >= _reported[key] else value
+        _reported[key] = value
+        if not delta:
+            continue
+        if key == "cache_hits":
+            metrics.inc('ml_syllable_cache_requests_total', delta, result='hit')
+        elif key == "cache_misses":
+            metrics.inc('ml_syllable_cache_requests_total', delta, result='miss')
+        else:
+            source = 'lexicon' if key == "lexicon_hits" else 'pyphen'
+            metrics.inc('ml_syllable_lookups_total', delta, source=source)
+
+
+metrics.register_collector(_report_metrics)
+
+
+def build_lexicon(words, path=LEXICON_PATH):
+    """Syllabify `words` with Pyphen and write them to a lexicon file."""
+    mapping = {}
+    for word in words:
+        word = word.strip().lower()
+        if word.isalpha() and word not in mapping:
+            mapping[word] = pyphen_syllables(word)
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    build_table(mapping, str(path))
+    return len(mapping)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2 and sys.argv[1] == 'build':
+        output = sys.argv[3] if len(sys.argv) > 3 else LEXICON_PATH
+        with open(sys.argv[2], encoding='utf-8') as f:
+            total = build_lexicon((w for line in f for w in line.split()), output)
+        print(f"✓ Wrote {total} words to {output}")
+    else:
+        print("Usage: python ml/nlp/syllables.py build WORDLIST [OUTPUT]")
@@ -1,14 +1,405 @@
 # ml/nlp/word_prediction_model.py
+"""
+N-gram word prediction for typing assistance.
 
-def get_next_word_prediction(partial_text):
+A trigram model with interpolated Kneser-Ney smoothing is trained offline
+from a local corpus. Training ranks the top-k next words for every
+unigram and (frequent) bigram context, so a prediction is only a lookup:
+a binary search over sorted arrays in a memory-mapped model file.
+Partially typed words are completed from an alphabetical vocabulary
+(every prefix is a contiguous id range), preferring words the context
+predicts and then the most frequent words.
+
+    python ml/nlp/word_prediction_model.py train --corpus brown --files extra.txt
+    python ml/nlp/word_prediction_model.py predict "the quick br"
+    python ml/nlp/word_prediction_model.py bench
+"""
+import argparse
+import heapq
+import json
+import mmap
+import os
+import random
+import re
+import struct
+import sys
+import time
+from array import array
+from collections import Counter, defaultdict
+from pathlib import Path
+
+MODEL_PATH = Path(os.environ.get(
+    'WORD_PREDICTION_MODEL', Path(__file__).resolve().parent / 'models' / 'word_prediction.ngram'
+))
+
+MAGIC = b'NGRM'
+VERSION = 1
+# magic, version, little-endian flag, vocab size, top-k, trigram contexts, bigram entries, trigram entries
+HEADER = struct.Struct('<4sIIIIIII')
+HEADER_SIZE = 64
+
+SENTENCE_START = '<s>'
+DISCOUNT = 0.75
+TOP_K = 10
+# Small prefix ranges are scanned directly; larger ones walk the frequency order
+RANGE_SCAN_LIMIT = 256
+
+_WORD_RE = re.compile(r"[a-z]+(?:'[a-z]+)*")
+_SENTENCE_RE = re.compile(r"[.!?\n]+")
+
+
+def tokenize_sentences(text):
+    """Lowercase word lists, one per sentence."""
+    for sentence in _SENTENCE_RE.split(text.lower()):
+        words = _WORD_RE.findall(sentence)
+        if words:
+            yield words
+
+
+# --- Training ---
+def _kneser_ney_tables(sentences, min_trigram_count):
+    unigrams = Counter()
+    bigrams = Counter()
+    trigrams = Counter()
+    for words in sentences:
+        padded = [SENTENCE_START, SENTENCE_START] + words
+        unigrams.update(words)
+        bigrams.update(zip(padded[1:], padded[2:]))
+        trigrams.update(zip(padded, padded[1:], padded[2:]))
+
+    # Continuation counts: how many distinct words precede w
+    continuation = Counter(w for (_, w) in bigrams)
+    total_bigram_types = len(bigrams)
+
+    def p_cont(w):
+        return continuation[w] / total_bigram_types
+
+    bi_followers = defaultdict(dict)
+    for (v, w), count in bigrams.items():
+        bi_followers[v][w] = count
+
+    tri_followers = defaultdict(dict)
+    for (u, v, w), count in trigrams.items():
+        tri_followers[(u, v)][w] = count
+
+    global_top = heapq.nlargest(TOP_K, continuation, key=lambda w: (continuation[w], w))
+
+    bigram_scores = {}
+    bigram_top = {}
+    for v, followers in bi_followers.items():
+        total = sum(followers.values())
+        backoff = DISCOUNT * len(followers) / total
+        scores = {w: max(c - DISCOUNT, 0) / total + backoff * p_cont(w) for w, c in followers.items()}
+        for w in global_top:
+            scores.setdefault(w, backoff * p_cont(w))
+        bigram_scores[v] = scores
+        bigram_top[v] = heapq.nlargest(TOP_K, scores, key=lambda w: (scores[w], w))
+
+    trigram_top = {}
+    for (u, v), followers in tri_followers.items():
+        total = sum(followers.values())
+        if total < min_trigram_count:
+            continue
+        backoff = DISCOUNT * len(followers) / total
+        lower = bigram_scores[v]
+        candidates = set(followers) | set(bigram_top[v])
+        scores = {
+            w: max(followers.get(w, 0) - DISCOUNT, 0) / total + backoff * lower.get(w, 0.0)
+            for w in candidates
+        }
+        top = heapq.nlargest(TOP_K, scores, key=lambda w: (scores[w], w))
+        # Only store contexts whose ranking differs from the bigram backoff
+        if top != bigram_top[v]:
+            trigram_top[(u, v)] = top
+
+    return unigrams, global_top, bigram_top, trigram_top
+
+
+def train(sentences, path=MODEL_PATH, min_trigram_count=2):
+    """Train a model from tokenized sentences and write it to `path`."""
+    unigrams, global_top, bigram_top, trigram_top = _kneser_ney_tables(sentences, min_trigram_count)
+
+    vocab = sorted(set(unigrams) | {SENTENCE_START}, key=lambda w: w.encode('utf-8'))
+    ids = {w: i for i, w in enumerate(vocab)}
+    size = len(vocab)
+
+    word_offsets = array('I', [0])
+    blob = bytearray()
+    for w in vocab:
+        blob += w.encode('utf-8')
+        word_offsets.append(len(blob))
+    counts = array('I', (unigrams.get(w, 0) for w in vocab))
+    by_frequency = array('I', sorted(range(size), key=lambda i: (-counts[i], i)))
+    global_ids = array('I', (ids[w] for w in global_top))
+
+    bi_offsets = array('I', [0])
+    bi_next = array('I')
+    for w in vocab:
+        bi_next.extend(ids[x] for x in bigram_top.get(w, ()))
+        bi_offsets.append(len(bi_next))
+
+    tri_keys = array('Q')
+    tri_offsets = array('I', [0])
+    tri_next = array('I')
+    for key, (u, v) in sorted((ids[u] * size + ids[v], (u, v)) for (u, v) in trigram_top):
+        tri_keys.append(key)
+        tri_next.extend(ids[x] for x in trigram_top[(u, v)])
+        tri_offsets.append(len(tri_next))
+
+    sections = [word_offsets, bytes(blob), counts, by_frequency, global_ids,
+                bi_offsets, bi_next, tri_keys, tri_offsets, tri_next]
+
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(
+            MAGIC, VERSION, sys.byteorder == 'little', size, len(global_ids),
+            len(tri_keys), len(bi_next), len(tri_next),
+        ).ljust(HEADER_SIZE, b'\0'))
+        f.write(struct.pack('<I', len(blob)).ljust(8, b'\0'))
+        for section in sections:
+            data = section if isinstance(section, bytes) else section.tobytes()
+            f.write(data)
+            f.write(b'\0' * (-len(data) % 8))
+    os.replace(tmp_path, path)
+    return size
+
+
+# --- Lookup ---
+class NGramModel:
+    """Memory-mapped, read-only view of a trained model file."""
+
+    def __init__(self, path=MODEL_PATH):
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, little, size, k, n_tri, n_bi_next, n_tri_next = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a word prediction model.")
+        if bool(little) != (sys.byteorder == 'little'):
+            raise ValueError(f"{path} was built on a machine with a different byte order.")
+        blob_size = struct.unpack_from('<I', self._mm, HEADER_SIZE)[0]
+
+        view = memoryview(self._mm)
+        offset = HEADER_SIZE + 8
+
+        def take(typecode, count, itemsize):
+            nonlocal offset
+            nbytes = count * itemsize
+            section = view[offset:offset + nbytes]
+            offset += nbytes + (-nbytes % 8)
+            return section.cast(typecode) if typecode != 'B' else section
+
+        self.size = size
+        self._word_offsets = take('I', size + 1, 4)
+        self._blob = take('B', blob_size, 1)
+        self._counts = take('I', size, 4)
+        self._by_frequency = take('I', size, 4)
+        self._global = take('I', k, 4)
+        self._bi_offsets = take('I', size + 1, 4)
+        self._bi_next = take('I', n_bi_next, 4)
+        self._tri_keys = take('Q', n_tri, 8)
+        self._tri_offsets = take('I', n_tri + 1, 4)
+        self._tri_next = take('I', n_tri_next, 4)
+        self._start_id = self.word_id(SENTENCE_START)
+
+    def word(self, word_id):
+        return self._word_bytes(word_id).decode('utf-8')
+
+    def _word_bytes(self, word_id):
+        return bytes(self._blob[self._word_offsets[word_id]:self._word_offsets[word_id + 1]])
+
+    def _lower_bound(self, key):
+        lo, hi = 0, self.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._word_bytes(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def word_id(self, word):
+        key = word.encode('utf-8')
+        i = self._lower_bound(key)
+        if i < self.size and self._word_bytes(i) == key:
+            return i
+        return None
+
+    def prefix_range(self, prefix):
+        """Ids [lo, hi) of all vocabulary words starting with `prefix`."""
+        key = prefix.encode('utf-8')
+        return self._lower_bound(key), self._lower_bound(key + b'\xff')
+
+    def _candidates(self, context):
+        """Ranked next-word ids for the last two context words."""
+        ids = [self.word_id(w) for w in context[-2:]]
+        ids = [self._start_id] * (2 - len(ids)) + ids
+        u, v = ids
+        if u is not None and v is not None:
+            key = u * self.size + v
+            i = _bisect(self._tri_keys, key)
+            if i < len(self._tri_keys) and self._tri_keys[i] == key:
+                return self._tri_next[self._tri_offsets[i]:self._tri_offsets[i + 1]]
+        if v is not None:
+            return self._bi_next[self._bi_offsets[v]:self._bi_offsets[v + 1]]
+        return self._global
+
+    def predict_next(self, context, k=3):
+        """Most likely next words after the context word list."""
+        return [self.word(i) for i in self._candidates(context)[:k]]
+
+    def complete(self, context, prefix, k=3):
+        """Completions of a partially typed word, context-ranked first."""
+        lo, hi = self.prefix_range(prefix)
+        if lo >= hi:
+            return []
+        chosen = [i for i in self._candidates(context) if lo <= i < hi and i != self._start_id][:k]
+
+        if len(chosen) < k:
+            if hi - lo <= RANGE_SCAN_LIMIT:
+                ranked = heapq.nlargest(k + len(chosen), range(lo, hi), key=lambda i: (self._counts[i], -i))
+            else:
+                ranked = (i for i in self._by_frequency if lo <= i < hi)
+            for i in ranked:
+                if i not in chosen and i != self._start_id:
+                    chosen.append(i)
+                    if len(chosen) == k:
+                        break
+        return [self.word(i) for i in chosen]
+
+    def predict(self, partial_text, k=3):
+        """
+        Predict from raw typed text: next words if the text ends at a word
+        boundary, otherwise completions of the word being typed.
+        """
+        # Only the last few words matter, so avoid scanning long texts
+        tail = partial_text[-200:].lower()
+        words = _WORD_RE.findall(_SENTENCE_RE.split(tail)[-1])
+        if tail and not tail[-1].isspace() and words and tail.endswith(words[-1]):
+            return self.complete(words[:-1], words[-1], k)
+        return self.predict_next(words, k)
+
+
+def _bisect(keys, key):
+    lo, hi = 0, len(keys)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if keys[mid] < key:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+_model = None
+_model_checked = False
+
+
+def get_model():
+    """Lazily load the model file; returns None if it has not been trained."""
+    global _model, _model_checked
+    if not _model_checked:
+        _model_checked = True
+        if MODEL_PATH.exists():
+            try:
+                _model = NGramModel(MODEL_PATH)
+            except (OSError, ValueError) as e:
+                print(f"⚠ Warning: Could not load word prediction model: {e}", file=sys.stderr)
+    return _model
+
+
+def prediction_count(k):
+    """
+    Validate a requested number of predictions and clamp it to 1..TOP_K.
+    Raises ValueError for anything but an integer (or integral string).
     """
-    Placeholder for a word prediction model (e.g., for typing assistance).
+    if isinstance(k, bool) or not isinstance(k, (int, str)):
+        raise ValueError("'k' must be an integer.")
+    try:
+        k = int(k)
+    except ValueError:
+        raise ValueError("'k' must be an integer.") from None
+    return max(1, min(k, TOP_K))
+
+
+def get_next_word_prediction(partial_text, k=3):
     """
-    print(f"Predicting next word for: '{partial_text}'")
-    # Dummy result based on common words:
-    if partial_text.lower().endswith('the'):
-        return ["quick", "big", "little"]
-    return ["is", "and", "to"]
+    Word predictions for typing assistance: the next word, or completions
+    of a partially typed word. Returns [] until a model has been trained.
+    """
+    model = get_model()
+    if model is None:
+        return []
+    return model.predict(partial_text or '', k)
+
+
+# --- Benchmark ---
+def benchmark(model, queries, repeat=3):
+    """Lookup latency percentiles (microseconds) over `queries`."""
+    timings = []
+    for _ in range(repeat):
+        for query in queries:
+            started = time.perf_counter()
+            model.predict(query)
+            timings.append((time.perf_counter() - started) * 1e6)
+    timings.sort()
+    return {
+        "lookups": len(timings),
+        "p50_us": round(timings[len(timings) // 2], 2),
+        "p99_us": round(timings[min(len(timings) - 1, int(len(timings) * 0.99))], 2),
+        "max_us": round(timings[-1], 2),
+    }
+
+
+def _sample_queries(model, count, seed=0):
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        words = [model.word(rng.randrange(model.size)) for _ in range(rng.randint(0, 3))]
+        words = [w for w in words if w != SENTENCE_START]
+        text = ' '.join(words)
+        if rng.random() < 0.5:
+            queries.append(text + ' ')
+        else:
+            queries.append(f"{text} {model.word(rng.randrange(model.size))[:rng.randint(1, 3)]}")
+    return queries
+
+
+def _corpus_sentences(corpora, files):
+    for name in corpora:
+        import nltk
+        corpus = getattr(nltk.corpus, name)
+        for fileid in corpus.fileids():
+            yield from tokenize_sentences(corpus.raw(fileid))
+    for path in files:
+        with open(path, encoding='utf-8', errors='ignore') as f:
+            yield from tokenize_sentences(f.read())
+
 
 if __name__ == '__main__':
-    print("Predictions:", get_next_word_prediction("The"))
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Train, query or benchmark the n-gram word predictor.")
+    sub = parser.add_subparsers(dest='command')
+    train_cmd = sub.add_parser('train')
+    train_cmd.add_argument('--corpus', nargs='*', default=[], help="Installed NLTK corpora, e.g. brown.")
+    train_cmd.add_argument('--files', nargs='*', default=[], help="Plain-text corpus files.")
+    train_cmd.add_argument('--min-trigram-count', type=int, default=2)
+    train_cmd.add_argument('--output', default=str(MODEL_PATH))
+    predict_cmd = sub.add_parser('predict')
+    predict_cmd.add_argument('text')
+    bench_cmd = sub.add_parser('bench')
+    bench_cmd.add_argument('--queries', type=int, default=2000)
+    args = parser.parse_args()
+
+    if args.command == 'train':
+        if not args.corpus and not args.files:
+            parser.error("Provide --corpus and/or --files.")
+        vocab_size = train(_corpus_sentences(args.corpus, args.files), args.output, args.min_trigram_count)
+        print(f"✓ Wrote model with {vocab_size} words to {args.output}")
+    elif args.command == 'bench':
+        model = get_model()
+        if model is None:
+            sys.exit(f"No model at {MODEL_PATH}; run 'train' first.")
+        print(json.dumps(benchmark(model, _sample_queries(model, args.queries))))
+    else:
+        text = args.text if args.command == 'predict' else "The"
+        print("Predictions:", get_next_word_prediction(text))
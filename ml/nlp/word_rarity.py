@@ -0,0 +1,138 @@
+# ml/nlp/word_rarity.py
+"""
+Word-rarity index of Zipf frequencies.
+
+The index is built offline from a local corpus (bundled NLTK corpora or
+plain-text files) and stored as a memory-mapped word table, so lookups
+are O(1) and cost almost no resident memory per worker. Build it with:
+
+    python ml/nlp/word_rarity.py build --corpus brown gutenberg
+    python ml/nlp/word_rarity.py build --files book1.txt book2.txt
+"""
+import argparse
+import math
+import os
+import re
+import sys
+from collections import Counter
+from pathlib import Path
+
+# Allow running as a script: make the ml/ directory importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nlp.word_table import MAX_VALUE, WordTable, build_table
+
+INDEX_PATH = Path(os.environ.get(
+    'WORD_FREQ_INDEX', Path(__file__).resolve().parent / 'models' / 'word_freq.idx'
+))
+
+# Zipf values are stored as integer hundredths
+ZIPF_SCALE = 100
+
+# Words at or above this Zipf value count as fully common (no rarity bonus)
+COMMON_ZIPF = 6.0
+# Words below this Zipf value are challenging even if they are short
+RARE_ZIPF = 3.0
+# How many syllables' worth of score a maximally rare word earns
+RARITY_WEIGHT = 3.0
+
+_WORD_RE = re.compile(r"[a-z]+")
+
+_index = None
+_index_checked = False
+
+
+def _get_index():
+    global _index, _index_checked
+    if not _index_checked:
+        _index_checked = True
+        if INDEX_PATH.exists():
+            try:
+                _index = WordTable(str(INDEX_PATH))
+            except (OSError, ValueError) as e:
+                print(f"⚠ Warning: Could not load word-frequency index: {e}", file=sys.stderr)
+    return _index
+
+
+def has_index():
+    return _get_index() is not None
+
+
+def zipf_frequency(word):
+    """
+    Zipf frequency of a lowercase word (log10 of occurrences per billion
+    words). Unknown words score 0.0; returns None when no index is built.
+    """
+    index = _get_index()
+    if index is None:
+        return None
+    return index.get(word, 0) / ZIPF_SCALE
+
+
+def is_rare(word):
+    zipf = zipf_frequency(word)
+    return zipf is not None and zipf < RARE_ZIPF
+
+
+def challenge_score(word, syllables):
+    """Combined syllable and rarity score used to rank challenging words."""
+    zipf = zipf_frequency(word)
+    if zipf is None:
+        return float(syllables)
+    rarity = max(0.0, COMMON_ZIPF - zipf) / COMMON_ZIPF
+    return syllables + RARITY_WEIGHT * rarity
+
+
+# --- Offline Index Build ---
+def count_words(texts):
+    counts = Counter()
+    for text in texts:
+        counts.update(_WORD_RE.findall(text.lower()))
+    return counts
+
+
+def _nltk_corpus_texts(names):
+    import nltk
+    for name in names:
+        corpus = getattr(nltk.corpus, name)
+        for fileid in corpus.fileids():
+            yield corpus.raw(fileid)
+
+
+def _file_texts(paths):
+    for path in paths:
+        with open(path, encoding='utf-8', errors='ignore') as f:
+            yield from f
+
+
+def build_index(counts, path=INDEX_PATH, min_count=1):
+    """Convert raw word counts to Zipf values and write the index file."""
+    total = sum(counts.values())
+    if not total:
+        raise ValueError("Corpus contains no words.")
+    mapping = {}
+    for word, count in counts.items():
+        if count >= min_count:
+            zipf = math.log10(count * 1e9 / total)
+            mapping[word] = max(1, min(MAX_VALUE, round(zipf * ZIPF_SCALE)))
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    build_table(mapping, str(path))
+    return len(mapping)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build the word-rarity (Zipf frequency) index.")
+    parser.add_argument('command', choices=['build'])
+    parser.add_argument('--corpus', nargs='*', default=[], help="Installed NLTK corpora, e.g. brown gutenberg.")
+    parser.add_argument('--files', nargs='*', default=[], help="Plain-text corpus files.")
+    parser.add_argument('--min-count', type=int, default=2, help="Drop words seen fewer times than this.")
+    parser.add_argument('--output', default=str(INDEX_PATH))
+    args = parser.parse_args()
+
+    if not args.corpus and not args.files:
+        parser.error("Provide --corpus and/or --files.")
+
+    word_counts = count_words(_nltk_corpus_texts(args.corpus))
+    word_counts.update(count_words(_file_texts(args.files)))
+    total_words = build_index(word_counts, args.output, args.min_count)
+    print(f"✓ Wrote {total_words} words to {args.output}")
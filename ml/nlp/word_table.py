@@ -0,0 +1,108 @@
+# ml/nlp/word_table.py
+"""
+Compact, memory-mapped word -> small integer table.
+
+The file is an open-addressing hash table keyed by a stable 64-bit digest
+of each word, so lookups are O(1) and the whole table is shared read-only
+(through the OS page cache) by every process that maps it.
+
+Layout (little-endian):
+    header  32 bytes: magic, version, value width, capacity, count
+    keys    u64 * capacity   (0 marks an empty slot)
+    values  u16 * capacity
+"""
+import hashlib
+import mmap
+import os
+import struct
+from array import array
+
+MAGIC = b'WTAB'
+VERSION = 1
+HEADER = struct.Struct('<4sHHQQ')
+HEADER_SIZE = 32
+MAX_VALUE = 0xFFFF
+
+_KEY = struct.Struct('<Q')
+_VALUE = struct.Struct('<H')
+
+
+def word_key(word):
+    """Stable 64-bit key for a word (never 0, which marks empty slots)."""
+    key = int.from_bytes(hashlib.blake2b(word.encode('utf-8'), digest_size=8).digest(), 'little')
+    return key or 1
+
+
+def _capacity_for(count):
+    # Keep the load factor at or below 0.5 so probe sequences stay short
+    capacity = 8
+    while capacity < count * 2:
+        capacity *= 2
+    return capacity
+
+
+def build_table(mapping, path):
+    """Write `mapping` (word -> int in 0..65535) to `path` atomically."""
+    capacity = _capacity_for(len(mapping))
+    mask = capacity - 1
+    keys = array('Q', bytes(8 * capacity))
+    values = array('H', bytes(2 * capacity))
+
+    for word, value in mapping.items():
+        if not 0 <= value <= MAX_VALUE:
+            raise ValueError(f"Value for {word!r} out of range: {value}")
+        key = word_key(word)
+        slot = key & mask
+        while keys[slot] and keys[slot] != key:
+            slot = (slot + 1) & mask
+        keys[slot] = key
+        values[slot] = value
+
+    if struct.pack('=H', 1) != struct.pack('<H', 1):
+        keys.byteswap()
+        values.byteswap()
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 2, capacity, len(mapping)).ljust(HEADER_SIZE, b'\0'))
+        f.write(keys.tobytes())
+        f.write(values.tobytes())
+    os.replace(tmp_path, path)
+
+
+class WordTable:
+    """Read-only view of a table file written by build_table()."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, width, capacity, count = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION or width != 2:
+            self._mm.close()
+            raise ValueError(f"{path} is not a word table file.")
+        self.path = path
+        self.capacity = capacity
+        self._count = count
+        self._mask = capacity - 1
+        self._values_offset = HEADER_SIZE + 8 * capacity
+
+    def get(self, word, default=None):
+        key = word_key(word)
+        slot = key & self._mask
+        mm = self._mm
+        while True:
+            stored = _KEY.unpack_from(mm, HEADER_SIZE + 8 * slot)[0]
+            if stored == key:
+                return _VALUE.unpack_from(mm, self._values_offset + 2 * slot)[0]
+            if stored == 0:
+                return default
+            slot = (slot + 1) & self._mask
+
+    def __contains__(self, word):
+        return self.get(word) is not None
+
+    def __len__(self):
+        return self._count
+
+    def close(self):
+        self._mm.close()
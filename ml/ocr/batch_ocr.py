@@ -0,0 +1,360 @@
+# ml/ocr/batch_ocr.py
+"""
+Batch OCR for multi-page uploads.
+
+Pages from multi-frame TIFFs, PDFs (needs pdf2image) and lists of image
+files are decoded and looked up in a result cache keyed by a hash of the
+decoded page and the OCR options, so re-uploaded pages return before any
+preprocessing or Tesseract run. The others are streamed, as they are
+read, to a process pool (a thread pool inside daemonic processes, which
+cannot have children) that runs the shared preprocessing stage
+(grayscale, Otsu binarization, deskew; vectorized with NumPy when
+available) and Tesseract, on horizontal bands of large pages when tiling.
+ocr.process_text shares the cache for single-image uploads.
+
+    python ml/ocr/batch_ocr.py page1.png scan.tiff [--workers 4] [--tile]
+"""
+import argparse
+import atexit
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+try:
+    from PIL import Image, ImageSequence
+    import pytesseract
+except ImportError:
+    Image = None
+    pytesseract = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Allow running as a script: make the ml/ directory importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ocr.process_text import tesseract_available
+
+CACHE_DIR = Path(os.environ.get('OCR_CACHE_DIR', Path(__file__).resolve().parent / 'cache'))
+MAX_SIDE = 1800
+# Pages taller than this (before any downscale) are split into horizontal
+# bands when tiling; tiled pages keep their full resolution
+TILE_MIN_HEIGHT = 2400
+TILE_HEIGHT = 1200
+# Bands of one page OCR'd at once (each is a Tesseract subprocess)
+TILE_THREADS = 4
+OCR_TIMEOUT = 30
+# Upper bound on OCR parallelism, whatever the caller asks for
+MAX_WORKERS = max(1, int(os.environ.get('OCR_MAX_WORKERS', os.cpu_count() or 1)))
+# Page texts kept in memory in front of the disk cache
+MEMORY_CACHE_SIZE = int(os.environ.get('OCR_MEMORY_CACHE_SIZE', 256))
+# Bumped whenever preprocessing changes, so stale cache entries are ignored
+PIPELINE_VERSION = 2
+
+_executor = None
+_memory_cache = OrderedDict()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        if multiprocessing.current_process().daemon:
+            # Daemonic processes (e.g. ml/worker.py workers) cannot start a
+            # process pool; Tesseract runs as a subprocess, so threads still overlap
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='ml-ocr')
+        else:
+            _executor = ProcessPoolExecutor(
+                max_workers=MAX_WORKERS, mp_context=multiprocessing.get_context('spawn')
+            )
+    return _executor
+
+
+@atexit.register
+def shutdown_executors():
+    """Shut down the pool started by ocr_documents."""
+    global _executor
+    if _executor is not None:
+        executor, _executor = _executor, None
+        executor.shutdown(cancel_futures=True)
+
+
+def _ms(started):
+    return round((time.perf_counter() - started) * 1000, 2)
+
+
+# --- Page Loading ---
+def iter_pages(path):
+    """Yield every page of an image file (multi-frame TIFF/GIF) or a PDF."""
+    if str(path).lower().endswith('.pdf'):
+        try:
+            from pdf2image import convert_from_path
+        except ImportError:
+            raise RuntimeError("PDF input needs pdf2image: pip install pdf2image")
+        yield from convert_from_path(str(path))
+        return
+
+    with Image.open(path) as img:
+        for frame in ImageSequence.Iterator(img):
+            yield frame.copy()
+
+
+# --- Shared Preprocessing ---
+def _otsu_threshold(gray):
+    histogram = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    total = gray.size
+    weights = np.cumsum(histogram)
+    means = np.cumsum(histogram * np.arange(256))
+    background = weights[:-1]
+    foreground = total - background
+    valid = (background > 0) & (foreground > 0)
+    between = np.zeros(255)
+    mean_bg = means[:-1][valid] / background[valid]
+    mean_fg = (means[-1] - means[:-1][valid]) / foreground[valid]
+    between[valid] = background[valid] * foreground[valid] * (mean_bg - mean_fg) ** 2
+    return int(np.argmax(between))
+
+
+def _skew_angle(binary, max_angle=5.0, step=0.5):
+    """Estimate skew by maximizing the variance of the row ink profile."""
+    ink = Image.fromarray(binary.astype(np.uint8) * 255)
+    # A downscaled copy is plenty for angle estimation
+    ink.thumbnail((600, 600))
+    best_angle, best_score = 0.0, -1.0
+    # Try small angles first so ties (e.g. blank pages) keep the page as-is
+    for angle in sorted(np.arange(-max_angle, max_angle + step, step), key=abs):
+        rotated = np.asarray(ink.rotate(angle, fillcolor=0)) > 127
+        score = float(np.var(rotated.sum(axis=1)))
+        if score > best_score:
+            best_angle, best_score = float(angle), score
+    return best_angle
+
+
+def preprocess(img, max_side=MAX_SIDE, deskew=True):
+    """Grayscale, downscale, binarize and deskew a page; returns a mode 'L' image."""
+    gray = img.convert('L')
+    if max_side and max(gray.size) > max_side:
+        gray.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+
+    if np is None:
+        return gray.point(lambda v: 255 if v > 127 else 0)
+
+    pixels = np.asarray(gray)
+    threshold = _otsu_threshold(pixels)
+    binary = pixels <= threshold  # True where there is ink
+    page = Image.fromarray(np.where(binary, 0, 255).astype(np.uint8))
+
+    if deskew:
+        angle = _skew_angle(binary)
+        if angle:
+            page = page.rotate(angle, expand=True, fillcolor=255)
+    return page
+
+
+def split_tiles(page, tile_height=TILE_HEIGHT):
+    """
+    Split a tall page into full-width bands, cutting at the emptiest row
+    near each boundary so text lines are not sliced in half.
+    """
+    if np is None or page.height < TILE_MIN_HEIGHT:
+        return [page]
+
+    ink_per_row = (np.asarray(page) < 128).sum(axis=1)
+    window = tile_height // 10
+    cuts = [0]
+    while page.height - cuts[-1] > tile_height + window:
+        target = cuts[-1] + tile_height
+        lo, hi = target - window, target + window
+        cuts.append(lo + int(np.argmin(ink_per_row[lo:hi])))
+    cuts.append(page.height)
+    return [page.crop((0, top, page.width, bottom)) for top, bottom in zip(cuts, cuts[1:])]
+
+
+# --- Result Cache ---
+def page_key(raw_page, options):
+    """Cache key of a decoded (not yet preprocessed) page and the OCR options."""
+    digest = hashlib.sha256()
+    digest.update(f"{PIPELINE_VERSION}|{raw_page.mode}|{raw_page.size}|{options}".encode())
+    digest.update(raw_page.tobytes())
+    return digest.hexdigest()
+
+
+def _remember(key, text):
+    _memory_cache[key] = text
+    _memory_cache.move_to_end(key)
+    while len(_memory_cache) > MEMORY_CACHE_SIZE:
+        _memory_cache.popitem(last=False)
+
+
+def _cache_get(key):
+    text = _memory_cache.get(key)
+    if text is not None:
+        _memory_cache.move_to_end(key)
+        return text
+    try:
+        with open(CACHE_DIR / f"{key}.json", encoding='utf-8') as f:
+            text = json.load(f)["text"]
+    except (OSError, ValueError, KeyError):
+        return None
+    _remember(key, text)
+    return text
+
+
+def _cache_put(key, text):
+    _remember(key, text)
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_path = CACHE_DIR / f".{key}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({"text": text}, f)
+    os.replace(tmp_path, CACHE_DIR / f"{key}.json")
+
+
+# --- OCR ---
+def _ocr_tile(tile, config):
+    started = time.perf_counter()
+    text = pytesseract.image_to_string(tile, timeout=OCR_TIMEOUT, config=config)
+    return text.strip(), _ms(started)
+
+
+def _ocr_page(args):
+    """
+    Pool task: preprocess one grayscale page, split it into tiles when
+    tiling and OCR them; returns (text, tiles, timings, error).
+    """
+    size, data, tiling, max_side, deskew, psm = args
+    timings = {}
+    started = time.perf_counter()
+    try:
+        # Tiled pages keep their resolution: each band is already small
+        page = preprocess(Image.frombytes('L', size, data), max_side=None if tiling else max_side, deskew=deskew)
+        tiles = split_tiles(page) if tiling else [page]
+        timings["preprocess_ms"] = _ms(started)
+        # Tiles are full-width text bands, so treat each as a uniform block
+        config = f"--psm {6 if len(tiles) > 1 else psm}"
+        if len(tiles) == 1:
+            results = [_ocr_tile(tiles[0], config)]
+        else:
+            # Tesseract runs as a subprocess, so a page's bands OCR in parallel on threads
+            with ThreadPoolExecutor(max_workers=min(len(tiles), TILE_THREADS)) as threads:
+                results = list(threads.map(_ocr_tile, tiles, [config] * len(tiles)))
+    except Exception as e:
+        return None, 0, timings, f"OCR Failed: {str(e)}"
+    timings["ocr_ms"] = round(sum(ms for _, ms in results), 2)
+    return '\n'.join(text for text, _ in results if text), len(tiles), timings, None
+
+
+def _finish_page(entry, key, output):
+    text, tiles, timings, error = output
+    entry["timings"].update(timings)
+    if error:
+        entry["success"] = False
+        entry["error"] = error
+        return
+    entry["tiles"] = tiles
+    entry["text"] = text
+    if key:
+        _cache_put(key, text)
+
+
+def ocr_documents(paths, workers=None, tile=False, max_side=MAX_SIDE, deskew=True, psm=3, use_cache=True):
+    """
+    OCR every page of every file in `paths` on a process pool.
+
+    Returns per-page text with timings (decode, preprocess, ocr) so it is
+    visible where the time goes; failed files are reported per source.
+    Pages are decoded and looked up in the cache here, then preprocessed
+    and OCR'd in the pool as they are decoded; at most `workers` (capped
+    at MAX_WORKERS) pages are in flight, and `workers=1` runs in this
+    process. With `tile`, pages at least TILE_MIN_HEIGHT tall skip the
+    downscale and are OCR'd as bands.
+    """
+    if Image is None or pytesseract is None:
+        return {
+            "success": False,
+            "error": "Missing libraries. Install: pip install pytesseract Pillow",
+        }
+    if not tesseract_available():
+        return {
+            "success": False,
+            "error": "Tesseract not installed. Install from: https://github.com/tesseract-ocr/tesseract",
+        }
+
+    started = time.perf_counter()
+    workers = min(max(1, int(workers or MAX_WORKERS)), MAX_WORKERS)
+    executor = _get_executor() if workers > 1 else None
+    pages = []
+    in_flight = deque()   # (entry, key, future)
+
+    def wait_oldest():
+        entry, key, future = in_flight.popleft()
+        _finish_page(entry, key, future.result())
+
+    try:
+        for path in paths:
+            if not os.path.exists(path):
+                pages.append({"source": str(path), "success": False, "error": f"File not found: {path}"})
+                continue
+            try:
+                decode_started = time.perf_counter()
+                for number, raw_page in enumerate(iter_pages(path), start=1):
+                    gray = raw_page.convert('L')
+                    entry = {
+                        "source": str(path),
+                        "page": number,
+                        "success": True,
+                        "timings": {"decode_ms": _ms(decode_started)},
+                    }
+                    pages.append(entry)
+                    # Checked before preprocessing, so a re-uploaded page costs only a hash
+                    tiling = tile and gray.height >= TILE_MIN_HEIGHT
+                    key = page_key(gray, (tiling, max_side, deskew, psm)) if use_cache else None
+                    cached = _cache_get(key) if use_cache else None
+                    entry["cached"] = cached is not None
+                    if cached is not None:
+                        entry["text"] = cached
+                    else:
+                        task = (gray.size, gray.tobytes(), tiling, max_side, deskew, psm)
+                        if executor is None:
+                            _finish_page(entry, key, _ocr_page(task))
+                        else:
+                            if len(in_flight) >= workers:
+                                wait_oldest()
+                            in_flight.append((entry, key, executor.submit(_ocr_page, task)))
+                    decode_started = time.perf_counter()
+            except Exception as e:
+                pages.append({"source": str(path), "success": False, "error": f"OCR Failed: {str(e)}"})
+        while in_flight:
+            wait_oldest()
+    finally:
+        for _, _, future in in_flight:
+            future.cancel()
+
+    texts = [p["text"] for p in pages if p.get("text")]
+    return {
+        "success": any(p["success"] for p in pages),
+        "extractedText": '\n\n'.join(texts) if texts else "No text detected in image.",
+        "source": "OCR Batch",
+        "pages": pages,
+        "timings": {"total_ms": _ms(started)},
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="OCR multi-page documents on a process pool.")
+    parser.add_argument('paths', nargs='+')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--tile', action='store_true', help="Split tall pages into bands OCR'd in parallel.")
+    parser.add_argument('--no-deskew', action='store_true')
+    parser.add_argument('--no-cache', action='store_true')
+    args = parser.parse_args()
+    print(json.dumps(ocr_documents(
+        args.paths, workers=args.workers, tile=args.tile,
+        deskew=not args.no_deskew, use_cache=not args.no_cache,
+    )))
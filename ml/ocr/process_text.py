@@ -3,6 +3,12 @@ import sys
 import json
 import os
 import traceback
+from functools import lru_cache
+
+# Allow running as a script: make the ml/ directory importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import inc, span
 
 try:
     from PIL import Image
@@ -12,9 +18,53 @@ except ImportError:
     pytesseract = None
 
 
+SINGLE_MAX_SIDE = 1800
+SINGLE_PSM = 3
+
+
+@lru_cache(maxsize=1)
+def tesseract_available() -> bool:
+    """Check for the Tesseract binary once per process."""
+    try:
+        pytesseract.get_tesseract_version()
+    except Exception:
+        return False
+    return True
+
+
 def extract_text_from_image(image_path: str) -> dict:
     """Extract text from an image using Tesseract OCR."""
-    
+    with span('ocr.total'):
+        result = _extract_text(image_path)
+    if not result["success"]:
+        outcome = "error"
+    elif result["source"] == "OCR (Empty)":
+        outcome = "empty"
+    else:
+        outcome = "ok"
+    inc('ml_ocr_requests_total', outcome=outcome)
+    return result
+
+
+def _text_result(clean_text: str, cached: bool = False) -> dict:
+    if not clean_text:
+        result = {
+            "success": True,
+            "extractedText": "No text detected in image.",
+            "source": "OCR (Empty)",
+        }
+    else:
+        result = {
+            "success": True,
+            "extractedText": clean_text,
+            "source": "OCR Upload",
+        }
+    if cached:
+        result["cached"] = True
+    return result
+
+
+def _extract_text(image_path: str) -> dict:
     # 1) Dependency check
     if Image is None or pytesseract is None:
         return {
@@ -31,47 +81,45 @@ def extract_text_from_image(image_path: str) -> dict:
 
     try:
         # 3) Open and process image
-        img = Image.open(image_path)
-        
-        # Convert to RGB if needed
-        if img.mode not in ('RGB', 'L'):
-            img = img.convert('RGB')
+        with span('ocr.decode'):
+            img = Image.open(image_path)
+            img.load()
+
+            # Convert to RGB if needed
+            if img.mode not in ('RGB', 'L'):
+                img = img.convert('RGB')
+
+        # Re-uploaded images skip resizing and Tesseract (cache shared with batch OCR)
+        from ocr.batch_ocr import _cache_get, _cache_put, page_key
+        key = page_key(img, ('upload', SINGLE_MAX_SIDE, SINGLE_PSM))
+        cached = _cache_get(key)
+        if cached is not None:
+            return _text_result(cached, cached=True)
 
         # Resize large images
-        max_size = (1800, 1800)
+        max_size = (SINGLE_MAX_SIDE, SINGLE_MAX_SIDE)
         if img.width > max_size[0] or img.height > max_size[1]:
-            img.thumbnail(max_size, Image.Resampling.LANCZOS)
+            with span('ocr.thumbnail'):
+                img.thumbnail(max_size, Image.Resampling.LANCZOS)
 
         # 4) Check Tesseract
-        try:
-            pytesseract.get_tesseract_version()
-        except Exception:
+        if not tesseract_available():
             return {
                 "success": False,
                 "error": "Tesseract not installed. Install from: https://github.com/tesseract-ocr/tesseract",
             }
 
         # 5) Run OCR with timeout
-        extracted_text = pytesseract.image_to_string(
-            img,
-            timeout=30,
-            config='--psm 3'
-        )
+        with span('ocr.tesseract'):
+            extracted_text = pytesseract.image_to_string(
+                img,
+                timeout=30,
+                config=f'--psm {SINGLE_PSM}'
+            )
         
         clean_text = extracted_text.strip()
-
-        if not clean_text:
-            return {
-                "success": True,
-                "extractedText": "No text detected in image.",
-                "source": "OCR (Empty)",
-            }
-
-        return {
-            "success": True,
-            "extractedText": clean_text,
-            "source": "OCR Upload",
-        }
+        _cache_put(key, clean_text)
+        return _text_result(clean_text)
 
     except Exception as e:
         return {
@@ -86,7 +134,10 @@ if __name__ == "__main__":
         sys.stdout.reconfigure(line_buffering=True)
         
         if len(sys.argv) > 1:
-            result = extract_text_from_image(sys.argv[1])
+            # Thin wrapper around the persistent worker's job handler
+            from worker import run_job
+
+            result = run_job({"op": "ocr", "path": sys.argv[1]})
             print(json.dumps(result), flush=True)
         else:
             print(json.dumps({
@@ -0,0 +1,259 @@
+# ml/serving.py
+"""
+Production serving for the ML API.
+
+CPU-bound handlers (text analysis) run on a process pool and I/O-bound
+ones (OCR via the Tesseract binary, TTS) on a thread pool. Admission is
+bounded: once ML_QUEUE_LIMIT requests are running or queued, new ones are
+rejected with 429 and Retry-After instead of waiting without bound. Each
+request has a timeout, and SIGTERM/SIGINT drain in-flight work before the
+server stops.
+
+    python ml/serving.py [--host 0.0.0.0] [--port 5050] [--threads 16]
+
+Uses waitress when installed, otherwise Werkzeug's threaded server with
+the debugger and reloader off. Any WSGI server can also load `wsgi:application`.
+"""
+import argparse
+import atexit
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+# Allow running as a script: make the ml/ directory importable
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+import metrics
+
+CPU_WORKERS = int(os.environ.get('ML_CPU_WORKERS', os.cpu_count() or 1))
+IO_WORKERS = int(os.environ.get('ML_IO_WORKERS', 8))
+QUEUE_LIMIT = int(os.environ.get('ML_QUEUE_LIMIT', 32))
+REQUEST_TIMEOUT = float(os.environ.get('ML_REQUEST_TIMEOUT', 30))
+DRAIN_TIMEOUT = float(os.environ.get('ML_DRAIN_TIMEOUT', 30))
+RETRY_AFTER = int(os.environ.get('ML_RETRY_AFTER', 2))
+
+
+class Overloaded(Exception):
+    """The request queue is full."""
+
+
+class Draining(Exception):
+    """The server is shutting down and no longer accepts work."""
+
+
+class RequestTimeout(Exception):
+    """The handler did not finish within the request timeout."""
+
+
+_slots = threading.BoundedSemaphore(QUEUE_LIMIT)
+_in_flight = 0
+_in_flight_lock = threading.Condition()
+_draining = False
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def _warm_worker():
+    """Pool initializer: load the models in each CPU worker before its first job."""
+    import startup
+    startup.warm_up()
+
+
+def _ping():
+    return os.getpid()
+
+
+def _get_executor(kind):
+    with _executors_lock:
+        executor = _executors.get(kind)
+        if executor is None:
+            if kind == 'cpu':
+                executor = ProcessPoolExecutor(
+                    max_workers=CPU_WORKERS,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_warm_worker,
+                )
+            else:
+                executor = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix='ml-io')
+            _executors[kind] = executor
+        return executor
+
+
+def pool(kind='cpu'):
+    """
+    The shared 'cpu' or 'io' pool, for handlers that fan work out over it
+    themselves. Call reset_pool(kind) after a BrokenProcessPool.
+    """
+    return _get_executor(kind)
+
+
+def reset_pool(kind):
+    """Drop a broken pool; the next request starts a fresh one."""
+    with _executors_lock:
+        _executors.pop(kind, None)
+
+
+def _acquire():
+    global _in_flight
+    if _draining:
+        raise Draining()
+    if not _slots.acquire(blocking=False):
+        raise Overloaded()
+    with _in_flight_lock:
+        _in_flight += 1
+
+
+def _release(*_):
+    global _in_flight
+    with _in_flight_lock:
+        _in_flight -= 1
+        _in_flight_lock.notify_all()
+    _slots.release()
+
+
+class admit:
+    """Hold one admission slot for work run in the request thread itself."""
+
+    def __enter__(self):
+        _acquire()
+        return self
+
+    def __exit__(self, *exc):
+        _release()
+
+
+def _call_attached(profile, fn, args):
+    # Pool threads join the request's profile while they run its work
+    with profile.attach():
+        return fn(*args)
+
+
+def run(fn, *args, kind='cpu', timeout=None):
+    """
+    Run `fn(*args)` on the bounded 'cpu' (process) or 'io' (thread) pool
+    and wait for the result. A timed-out job keeps its slot until it
+    actually finishes, so abandoned work still counts against the limit.
+    """
+    profile = metrics.current_profile()
+    _acquire()
+    try:
+        if kind == 'cpu':
+            # Metrics (and profile samples) recorded in the child come back with the result
+            future = _get_executor(kind).submit(metrics.collect, fn, args, profile is not None)
+        elif profile is not None:
+            future = _get_executor(kind).submit(_call_attached, profile, fn, args)
+        else:
+            future = _get_executor(kind).submit(fn, *args)
+    except BaseException:
+        _release()
+        raise
+    future.add_done_callback(_release)
+    try:
+        result = future.result(timeout=timeout or REQUEST_TIMEOUT)
+    except FutureTimeout:
+        future.cancel()
+        raise RequestTimeout()
+    except BrokenProcessPool:
+        # A worker process died; start a fresh pool for the next request
+        reset_pool(kind)
+        raise
+
+    if kind != 'cpu':
+        return result
+    result, recorded, stacks = result
+    metrics.merge(recorded)
+    if profile is not None:
+        profile.merge(stacks)
+    return result
+
+
+def prime(timeout=None):
+    """
+    Start every CPU worker now and wait until each has warmed up, so the
+    first requests do not pay for process start-up and model loading.
+    """
+    executor = _get_executor('cpu')
+    # Submitted together, each job finds no idle worker and starts a new one
+    futures = [executor.submit(_ping) for _ in range(CPU_WORKERS)]
+    for future in futures:
+        future.result(timeout=timeout)
+
+
+def in_flight():
+    return _in_flight
+
+
+def is_draining():
+    return _draining
+
+
+def drain(timeout=DRAIN_TIMEOUT):
+    """Stop admitting work and wait (up to `timeout`) for in-flight work."""
+    global _draining
+    _draining = True
+    with _in_flight_lock:
+        _in_flight_lock.wait_for(lambda: _in_flight == 0, timeout=timeout)
+    return _in_flight == 0
+
+
+@atexit.register
+def shutdown():
+    """Shut down the worker pools."""
+    with _executors_lock:
+        while _executors:
+            _, executor = _executors.popitem()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the ML API in production mode.")
+    parser.add_argument('--host', default=os.environ.get('ML_HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('ML_PORT', 5050)))
+    parser.add_argument('--threads', type=int, default=16, help="HTTP worker threads.")
+    args = parser.parse_args(argv)
+
+    # Use the same module instance as api.py, not this __main__ copy
+    import serving
+    import startup
+    from api import app
+
+    startup.start_warm_up(background=True)
+
+    try:
+        from waitress import create_server
+        server = create_server(app, host=args.host, port=args.port, threads=args.threads)
+        stop = server.close
+        serve_forever = server.run
+    except ImportError:
+        from werkzeug.serving import make_server
+        server = make_server(args.host, args.port, app, threaded=True)
+        stop = server.shutdown
+        serve_forever = server.serve_forever
+
+    def handle_signal(signum, frame):
+        def drain_and_stop():
+            print("⏳ Draining in-flight requests...", file=sys.stderr)
+            serving.drain()
+            stop()
+        threading.Thread(target=drain_and_stop, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    print(f"🚀 ML Service (production) running on http://{args.host}:{args.port}", file=sys.stderr)
+    try:
+        serve_forever()
+    except OSError:
+        # waitress raises when its socket is closed from the drain thread
+        if not serving.is_draining():
+            raise
+    serving.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,355 @@
+# ml/speech/stt_pipeline.py
+"""
+Chunked, segment-parallel speech-to-text.
+
+Audio is read in fixed-size frames and split into utterances by an
+energy-based voice-activity detector. Each utterance is handed to a
+recognizer on a thread pool as soon as it ends, and partial transcripts
+are yielded as they complete. Recognizers are pluggable (STT_RECOGNIZER):
+
+    google  - Google Web Speech API via speech_recognition (needs network)
+    sphinx  - CMU PocketSphinx via speech_recognition (offline, optional)
+    stub    - offline stand-in that labels each segment, for testing
+
+    python ml/speech/stt_pipeline.py recording.wav [--recognizer stub]
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import wave
+from array import array
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Allow running as a script: make the ml/ directory importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import inc, span
+
+FRAME_MS = 30
+# Speech must last this long to open a segment, silence this long to close it
+MIN_SPEECH_MS = 90
+HANGOVER_MS = 450
+# Long monologues are cut so no single recognizer call blocks for too long
+MAX_SEGMENT_MS = 15000
+PAD_MS = 150
+# A frame is speech when its RMS exceeds the noise floor by this ratio
+ENERGY_RATIO = 3.0
+MIN_ENERGY = 120.0
+MAX_WORKERS = int(os.environ.get('STT_WORKERS', 4))
+
+
+class UnintelligibleSpeech(Exception):
+    """The recognizer heard audio but could not transcribe it."""
+
+
+class RecognizerUnavailable(Exception):
+    """The recognizer backend could not be reached or is not installed."""
+
+
+# --- Audio Reading ---
+class Segment:
+    def __init__(self, index, start, end, data, sample_rate, sample_width):
+        self.index = index
+        self.start = start
+        self.end = end
+        self.data = data
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+
+
+_TYPECODES = {1: 'B', 2: 'h', 4: 'i'}
+
+
+def _widen_24bit(data):
+    """Convert 24-bit little-endian PCM to 32-bit (samples scaled by 256)."""
+    out = bytearray(len(data) // 3 * 4)
+    out[1::4] = data[0::3]
+    out[2::4] = data[1::3]
+    out[3::4] = data[2::3]
+    return bytes(out)
+
+
+def _to_mono(data, sample_width, channels):
+    if channels == 1:
+        return data
+    samples = array(_TYPECODES[sample_width], data)
+    return samples[::channels].tobytes()
+
+
+def _frame_rms(data, sample_width):
+    samples = array(_TYPECODES[sample_width], data)
+    if not samples:
+        return 0.0
+    if sample_width == 1:
+        # 8-bit WAV is unsigned, centred on 128
+        return math.sqrt(sum((s - 128) ** 2 for s in samples) / len(samples)) * 256
+    if sample_width == 4:
+        return math.sqrt(sum(s * s for s in samples) / len(samples)) / 65536
+    return math.sqrt(sum(s * s for s in samples) / len(samples))
+
+
+def iter_frames(path, frame_ms=FRAME_MS):
+    """
+    Yield (mono_pcm_bytes, sample_rate, sample_width) frames from a WAV
+    file without loading it whole; 24-bit audio is widened to 32-bit.
+    Other formats speech_recognition can read (AIFF, FLAC) are decoded
+    first and then framed.
+    """
+    try:
+        with wave.open(str(path), 'rb') as source:
+            rate, width, channels = source.getframerate(), source.getsampwidth(), source.getnchannels()
+            frames_per_chunk = max(1, rate * frame_ms // 1000)
+            while True:
+                data = source.readframes(frames_per_chunk)
+                if not data:
+                    break
+                if width == 3:
+                    yield _to_mono(_widen_24bit(data), 4, channels), rate, 4
+                else:
+                    yield _to_mono(data, width, channels), rate, width
+        return
+    except wave.Error:
+        pass
+
+    import speech_recognition as sr
+    with sr.AudioFile(str(path)) as source:
+        audio = sr.Recognizer().record(source)
+    rate, width = audio.sample_rate, audio.sample_width
+    step = max(1, rate * frame_ms // 1000) * width
+    for offset in range(0, len(audio.frame_data), step):
+        yield audio.frame_data[offset:offset + step], rate, width
+
+
+def iter_segments(frames, frame_ms=FRAME_MS):
+    """Energy-based VAD: group frames into utterance Segments as they arrive."""
+    start_frames = max(1, MIN_SPEECH_MS // frame_ms)
+    hangover_frames = max(1, HANGOVER_MS // frame_ms)
+    max_frames = max(1, MAX_SEGMENT_MS // frame_ms)
+    pad_frames = PAD_MS // frame_ms
+
+    # Start from the minimum speech level rather than the first frame, so
+    # audio that opens with speech does not set the floor at speech level
+    noise_floor = MIN_ENERGY
+    history = []          # recent frames kept as leading padding
+    current = None        # frames of the segment being collected
+    speech_run = 0
+    silence_run = 0
+    index = 0
+    position = 0          # frame counter
+    rate = width = None
+
+    def emit(frames_list, end_position):
+        nonlocal index
+        start_position = end_position - len(frames_list)
+        segment = Segment(
+            index,
+            round(start_position * frame_ms / 1000, 3),
+            round(end_position * frame_ms / 1000, 3),
+            b''.join(frames_list),
+            rate,
+            width,
+        )
+        index += 1
+        return segment
+
+    for data, rate, width in frames:
+        energy = _frame_rms(data, width)
+        is_speech = energy > max(MIN_ENERGY, noise_floor * ENERGY_RATIO)
+        if energy < noise_floor:
+            noise_floor = energy
+        elif not is_speech:
+            # Track the background level slowly so loud speech does not raise it
+            noise_floor = 0.95 * noise_floor + 0.05 * energy
+        position += 1
+
+        if current is None:
+            history.append(data)
+            speech_run = speech_run + 1 if is_speech else 0
+            if speech_run >= start_frames:
+                keep = start_frames + pad_frames
+                current = history[-keep:]
+                history = []
+                silence_run = 0
+            elif len(history) > start_frames + pad_frames:
+                history.pop(0)
+            continue
+
+        current.append(data)
+        silence_run = 0 if is_speech else silence_run + 1
+        if silence_run >= hangover_frames or len(current) >= max_frames:
+            # Keep a little trailing silence as padding, drop the rest
+            trim = max(0, silence_run - pad_frames)
+            kept = current[:len(current) - trim] if trim else current
+            yield emit(kept, position - trim)
+            current = None
+            speech_run = 0
+
+    if current:
+        yield emit(current, position)
+
+
+def whole_file_segment(path):
+    """
+    The whole file as one Segment, for audio the VAD found no utterance
+    in; None when it is empty or digital silence.
+    """
+    frames = list(iter_frames(path))
+    if not frames or not any(_frame_rms(data, width) for data, _, width in frames):
+        return None
+    _, rate, width = frames[0]
+    data = b''.join(data for data, _, _ in frames)
+    end = round(len(data) / (rate * width), 3)
+    return Segment(0, 0.0, end, data, rate, width)
+
+
+# --- Recognizers ---
+class GoogleRecognizer:
+    name = 'google'
+
+    def __init__(self, language='en-US'):
+        import speech_recognition as sr
+        self._sr = sr
+        self._recognizer = sr.Recognizer()
+        self.language = language
+
+    def transcribe(self, segment):
+        audio = self._sr.AudioData(segment.data, segment.sample_rate, segment.sample_width)
+        try:
+            return self._recognizer.recognize_google(audio, language=self.language)
+        except self._sr.UnknownValueError:
+            raise UnintelligibleSpeech()
+        except self._sr.RequestError as e:
+            raise RecognizerUnavailable(str(e))
+
+
+class SphinxRecognizer(GoogleRecognizer):
+    """Offline recognition with PocketSphinx (pip install pocketsphinx)."""
+    name = 'sphinx'
+
+    def transcribe(self, segment):
+        audio = self._sr.AudioData(segment.data, segment.sample_rate, segment.sample_width)
+        try:
+            return self._recognizer.recognize_sphinx(audio, language=self.language)
+        except self._sr.UnknownValueError:
+            raise UnintelligibleSpeech()
+        except self._sr.RequestError as e:
+            raise RecognizerUnavailable(str(e))
+
+
+class StubRecognizer:
+    """
+    Offline stand-in. Returns the next scripted transcript per segment
+    (e.g. the target word) or a label with the segment's time range.
+    """
+    name = 'stub'
+
+    def __init__(self, language='en-US', script=None):
+        self.script = list(script or [])
+
+    def transcribe(self, segment):
+        if segment.index < len(self.script):
+            return self.script[segment.index]
+        return f"[speech {segment.start:.2f}-{segment.end:.2f}s]"
+
+
+RECOGNIZERS = {
+    'google': GoogleRecognizer,
+    'sphinx': SphinxRecognizer,
+    'stub': StubRecognizer,
+}
+
+
+def register_recognizer(name, recognizer_cls):
+    """Register a recognizer selectable through STT_RECOGNIZER."""
+    RECOGNIZERS[name] = recognizer_cls
+
+
+def get_recognizer(name=None, **options):
+    name = name or os.environ.get('STT_RECOGNIZER', 'google')
+    if name not in RECOGNIZERS:
+        raise ValueError(f"Unknown STT recognizer: {name!r}")
+    return RECOGNIZERS[name](**options)
+
+
+# --- Pipeline ---
+def _transcribe_segment(recognizer, segment):
+    try:
+        with span('stt.recognize'):
+            text = recognizer.transcribe(segment)
+    except UnintelligibleSpeech:
+        inc('ml_stt_segments_total', outcome='unintelligible')
+        return {"text": "", "unintelligible": True}
+    except RecognizerUnavailable as e:
+        inc('ml_stt_segments_total', outcome='unavailable')
+        return {"text": "", "error": f"Speech service unavailable: {e}"}
+    inc('ml_stt_segments_total', outcome='ok')
+    return {"text": text}
+
+
+def transcribe_stream(path, recognizer=None, max_workers=MAX_WORKERS):
+    """
+    Transcribe an audio file segment by segment. Yields a "partial" record
+    as each segment finishes (in completion order) and then a "final"
+    record with the segments joined in time order.
+    """
+    recognizer = recognizer or get_recognizer()
+    results = {}
+    pending = {}
+
+    def completed(done):
+        for future in done:
+            segment = pending.pop(future)
+            record = {
+                "type": "partial",
+                "segment": segment.index,
+                "start": segment.start,
+                "end": segment.end,
+                **future.result(),
+            }
+            results[segment.index] = record
+            yield record
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for segment in iter_segments(iter_frames(path)):
+            pending[executor.submit(_transcribe_segment, recognizer, segment)] = segment
+            done = [f for f in pending if f.done()]
+            yield from completed(done)
+        if not results and not pending:
+            # Nothing sounded like speech to the VAD; let the recognizer judge the whole file
+            segment = whole_file_segment(path)
+            if segment is not None:
+                pending[executor.submit(_transcribe_segment, recognizer, segment)] = segment
+        while pending:
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            yield from completed(done)
+
+    ordered = [results[i] for i in sorted(results)]
+    texts = [r["text"] for r in ordered if r["text"]]
+    errors = [r["error"] for r in ordered if r.get("error")]
+    final = {
+        "type": "final",
+        "transcription": ' '.join(texts),
+        "segments": len(ordered),
+    }
+    if errors and not texts:
+        final["error"] = errors[0]
+    yield final
+
+
+def transcribe(path, recognizer=None, max_workers=MAX_WORKERS):
+    """Run the pipeline to completion and return the final record."""
+    final = None
+    for record in transcribe_stream(path, recognizer, max_workers):
+        final = record
+    return final
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Segment-parallel speech-to-text.")
+    parser.add_argument('path')
+    parser.add_argument('--recognizer', default=None)
+    args = parser.parse_args()
+    for entry in transcribe_stream(args.path, get_recognizer(args.recognizer)):
+        print(json.dumps(entry), flush=True)
@@ -0,0 +1,291 @@
+# ml/speech/tts_cache.py
+"""
+Content-addressed TTS audio cache.
+
+Clips are named by a stable digest of the normalized text, language,
+voice and synthesis backend, so identical requests map to the same file
+in every process. An index file records each clip's size and text; the
+directory is kept under a byte budget by evicting least-recently-used
+clips (cache hits refresh the clip's mtime).
+
+    python ml/speech/tts_cache.py prefetch "Passage text ..."
+    python ml/speech/tts_cache.py prune      # remove evicted/orphaned clips
+"""
+import hashlib
+import json
+import math
+import os
+import re
+import struct
+import sys
+import threading
+import time
+import unicodedata
+import wave
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+# Allow running as a script: make the ml/ directory importable
+sys.path.append(str(PROJECT_ROOT / 'ml'))
+
+from metrics import inc, span
+
+AUDIO_DIR = Path(os.environ.get('TTS_CACHE_DIR', PROJECT_ROOT / 'backend' / 'audio_temp'))
+INDEX_NAME = 'tts_index.json'
+MAX_BYTES = int(os.environ.get('TTS_CACHE_BYTES', 200 * 1024 * 1024))
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+# --- Synthesis Backends ---
+class GTTSBackend:
+    """Google Text-to-Speech (needs network access)."""
+    name = 'gtts'
+    extension = 'mp3'
+
+    def synthesize(self, text, lang, voice, output_path):
+        from gtts import gTTS
+        # gTTS selects regional accents through the Google domain (tld)
+        tts = gTTS(text=text, lang=lang, tld=voice or 'com')
+        tts.save(str(output_path))
+
+
+class LocalToneBackend:
+    """
+    Offline stand-in that renders a short tone per word as a WAV file.
+    Deterministic, so the cache can be exercised without network access.
+    """
+    name = 'local'
+    extension = 'wav'
+    sample_rate = 8000
+
+    def synthesize(self, text, lang, voice, output_path):
+        frames = bytearray()
+        for word in text.split() or [text]:
+            digest = hashlib.sha1(word.encode('utf-8')).digest()
+            frequency = 220 + digest[0] * 2
+            for i in range(self.sample_rate // 5):
+                sample = int(8000 * math.sin(2 * math.pi * frequency * i / self.sample_rate))
+                frames += struct.pack('<h', sample)
+            frames += bytes(2 * self.sample_rate // 20)
+        with wave.open(str(output_path), 'wb') as out:
+            out.setnchannels(1)
+            out.setsampwidth(2)
+            out.setframerate(self.sample_rate)
+            out.writeframes(bytes(frames))
+
+
+BACKENDS = {
+    'gtts': GTTSBackend,
+    'local': LocalToneBackend,
+}
+
+
+def register_backend(name, backend_cls):
+    """Register a synthesis backend selectable through TTS_BACKEND."""
+    BACKENDS[name] = backend_cls
+
+
+def get_backend(name=None):
+    name = name or os.environ.get('TTS_BACKEND', 'gtts')
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown TTS backend: {name!r}")
+    return BACKENDS[name]()
+
+
+def normalize_text(text):
+    """Canonical form of the text used for cache keys and synthesis."""
+    return _WHITESPACE_RE.sub(' ', unicodedata.normalize('NFC', text)).strip()
+
+
+# --- Cache ---
+class TTSCache:
+    def __init__(self, directory=AUDIO_DIR, max_bytes=MAX_BYTES, backend=None):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.backend = backend or get_backend()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def index_path(self):
+        return self.directory / INDEX_NAME
+
+    def key_for(self, text, lang='en', voice=None):
+        material = '\0'.join([normalize_text(text), lang, voice or '', self.backend.name])
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()[:32]
+
+    def filename_for(self, text, lang='en', voice=None):
+        return f"{self.key_for(text, lang, voice)}.{self.backend.extension}"
+
+    @contextmanager
+    def _locked(self):
+        """Serialize index updates across threads and worker processes."""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.directory / f"{INDEX_NAME}.lock", 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_index(self):
+        try:
+            with open(self.index_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_index(self, index):
+        tmp_path = self.index_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def lookup(self, text, lang='en', voice=None):
+        """Return the cached clip's filename (refreshing its LRU stamp) or None."""
+        filename = self.filename_for(text, lang, voice)
+        path = self.directory / filename
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return filename
+
+    def synthesize(self, text, lang='en', voice=None):
+        """Return the filename of a clip for `text`, synthesizing it on a miss."""
+        text = normalize_text(text)
+        if not text:
+            raise ValueError("Cannot synthesize empty text.")
+
+        filename = self.lookup(text, lang, voice)
+        if filename:
+            self.hits += 1
+            inc('ml_tts_cache_requests_total', result='hit')
+            return filename
+
+        self.misses += 1
+        inc('ml_tts_cache_requests_total', result='miss')
+        filename = self.filename_for(text, lang, voice)
+        path = self.directory / filename
+        tmp_path = self.directory / f".{filename}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with span('tts.synthesize'):
+                self.backend.synthesize(text, lang, voice, tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+        with self._locked():
+            index = self._read_index()
+            index[filename] = {
+                "bytes": path.stat().st_size,
+                "text": text,
+                "lang": lang,
+                "voice": voice,
+                "backend": self.backend.name,
+                "created": time.time(),
+            }
+            self._evict(index, keep=filename)
+            self._write_index(index)
+        return filename
+
+    def presynthesize(self, words, lang='en', voice=None):
+        """Synthesize per-word clips ahead of time; returns {word: filename}."""
+        clips = {}
+        for word in words:
+            try:
+                clips[word] = self.synthesize(word, lang, voice)
+            except Exception as e:
+                print(f"Error pre-synthesizing {word!r}: {e}", file=sys.stderr)
+        return clips
+
+    def _evict(self, index, keep=None):
+        total = sum(entry["bytes"] for entry in index.values())
+        if total <= self.max_bytes:
+            return
+
+        def last_used(filename):
+            try:
+                return (self.directory / filename).stat().st_mtime
+            except OSError:
+                return 0.0
+
+        for filename in sorted(index, key=last_used):
+            if total <= self.max_bytes:
+                break
+            if filename == keep:
+                continue
+            total -= index.pop(filename)["bytes"]
+            self.evictions += 1
+            try:
+                (self.directory / filename).unlink()
+            except OSError:
+                pass
+
+    def prune(self):
+        """Drop index entries with missing files and clips not in the index."""
+        removed = 0
+        with self._locked():
+            index = self._read_index()
+            for filename in [f for f in index if not (self.directory / f).exists()]:
+                del index[filename]
+            for path in self.directory.glob('*.*'):
+                if path.is_file() and path.suffix in ('.mp3', '.wav') and path.name not in index:
+                    path.unlink()
+                    removed += 1
+            self._evict(index)
+            self._write_index(index)
+        return removed
+
+    def stats(self):
+        index = self._read_index()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(index),
+            "bytes": sum(entry["bytes"] for entry in index.values()),
+            "max_bytes": self.max_bytes,
+            "backend": self.backend.name,
+        }
+
+
+_cache = None
+
+
+def get_cache():
+    """Process-wide cache using the configured directory, budget and backend."""
+    global _cache
+    if _cache is None:
+        _cache = TTSCache()
+    return _cache
+
+
+def presynthesize_passage(text, lang='en', voice=None):
+    """Pre-synthesize clips for a passage's challenging words."""
+    from nlp.reading_analysis import analyze_reading_content
+    words = analyze_reading_content(text)["challenging_words"]
+    return get_cache().presynthesize(words, lang, voice)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2 and sys.argv[1] == 'prefetch':
+        print(json.dumps(presynthesize_passage(sys.argv[2])))
+    elif len(sys.argv) > 1 and sys.argv[1] == 'prune':
+        print(f"✓ Removed {get_cache().prune()} orphaned clips")
+    else:
+        print("Usage: python ml/speech/tts_cache.py prefetch TEXT | prune")
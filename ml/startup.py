@@ -0,0 +1,158 @@
+# ml/startup.py
+"""
+Cold-start support for the ML service: NLTK resource manifest, warm-up
+and a startup-time report.
+
+Heavy modules (nltk, pyphen, model files) are imported on first use; the
+warm-up step triggers those first uses before traffic arrives. Set
+ML_OFFLINE=1 to never attempt NLTK downloads (missing resources are then
+reported by the readiness probe instead of retried on every start).
+"""
+import os
+import socket
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+OFFLINE = os.environ.get('ML_OFFLINE', '').lower() in ('1', 'true', 'yes')
+DOWNLOAD_TIMEOUT = 10
+
+# NLTK resources: package name -> (nltk.data path, required for readiness)
+NLTK_MANIFEST = {
+    'punkt_tab': ('tokenizers/punkt_tab', True),
+    'averaged_perceptron_tagger': ('taggers/averaged_perceptron_tagger', False),
+    'wordnet': ('corpora/wordnet', False),
+}
+
+_timings = []
+_missing = None
+_ready = threading.Event()
+_warmup_error = None
+_warm_up_started = False
+_warm_up_lock = threading.Lock()
+
+
+@contextmanager
+def timed(stage):
+    """Record how long a startup stage took."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _timings.append((stage, round((time.perf_counter() - started) * 1000, 2)))
+
+
+def ensure_nltk_resources(download=not OFFLINE):
+    """
+    Check every manifest resource once (downloading missing ones unless
+    offline) and return the names of required resources still missing.
+    """
+    global _missing
+    if _missing is not None:
+        return _missing
+
+    with timed('import nltk'):
+        import nltk
+
+    missing = []
+    with timed('nltk resource check'):
+        for name, (path, required) in NLTK_MANIFEST.items():
+            try:
+                nltk.data.find(path)
+                continue
+            except LookupError:
+                pass
+
+            downloaded = False
+            if download and required:
+                previous_timeout = socket.getdefaulttimeout()
+                socket.setdefaulttimeout(DOWNLOAD_TIMEOUT)
+                try:
+                    downloaded = nltk.download(name, quiet=True)
+                except Exception as e:
+                    print(f"⚠ Warning: Could not download {name}: {e}", file=sys.stderr)
+                finally:
+                    socket.setdefaulttimeout(previous_timeout)
+
+            if downloaded:
+                print(f"✓ Downloaded NLTK resource: {name}", file=sys.stderr)
+            elif required:
+                missing.append(name)
+                print(f"⚠ Warning: Missing NLTK resource: {name}", file=sys.stderr)
+
+    _missing = missing
+    return missing
+
+
+def warm_up(prime_pool=False):
+    """
+    Load the tokenizer, syllable dictionary and model files now. With
+    `prime_pool`, also start and warm the serving CPU pool's workers
+    (this runs in each of them as the pool initializer).
+    """
+    global _warmup_error
+    try:
+        missing = ensure_nltk_resources()
+
+        with timed('import nlp.reading_analysis'):
+            from nlp.reading_analysis import analyze_reading_content
+        with timed('load syllable dictionary'):
+            from nlp.syllables import preload
+            preload()
+        with timed('load word-rarity index'):
+            from nlp.word_rarity import has_index
+            has_index()
+        with timed('load word prediction model'):
+            from nlp.word_prediction_model import get_model
+            get_model()
+        if not missing:
+            with timed('first analysis (tokenizer load)'):
+                analyze_reading_content("Warm-up sentence for the reading assistant.")
+        if prime_pool:
+            import serving
+            with timed('warm CPU worker pool'):
+                serving.prime()
+    except Exception as e:
+        _warmup_error = str(e)
+        print(f"⚠ Warning: Warm-up failed: {e}", file=sys.stderr)
+    finally:
+        _ready.set()
+
+
+def start_warm_up(background=True):
+    """
+    Warm up the service process and its CPU worker pool. Only the first
+    call does anything, however many entry points ask for it.
+    """
+    global _warm_up_started
+    with _warm_up_lock:
+        if _warm_up_started:
+            return
+        _warm_up_started = True
+    if background:
+        threading.Thread(target=warm_up, args=(True,), name='ml-warm-up', daemon=True).start()
+    else:
+        warm_up(prime_pool=True)
+
+
+def is_ready():
+    return _ready.is_set() and _warmup_error is None and not _missing
+
+
+def readiness():
+    """Readiness details for the /readyz probe."""
+    return {
+        "ready": is_ready(),
+        "warmed_up": _ready.is_set(),
+        "missing_resources": list(_missing or []),
+        "error": _warmup_error,
+    }
+
+
+def startup_report():
+    """Per-stage startup timings in milliseconds, in the order they ran."""
+    return {
+        "stages": [{"stage": stage, "ms": ms} for stage, ms in _timings],
+        "total_ms": round(sum(ms for _, ms in _timings), 2),
+    }
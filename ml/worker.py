@@ -0,0 +1,372 @@
+# ml/worker.py
+"""
+Persistent ML worker.
+
+Loads the NLP / OCR / speech modules once per worker process and serves
+jobs over a newline-delimited JSON protocol, either on stdin/stdout or on
+a Unix socket. Each request line is a JSON object such as:
+
+    {"id": "42", "op": "analyze", "text": "...", "tokenizer": "fast"}
+    {"id": "43", "op": "ocr", "path": "/tmp/upload.png"}
+    {"id": "47", "op": "ocr_batch", "paths": ["/tmp/scan.tiff"], "tile": true}
+    {"id": "44", "op": "tts", "text": "dyslexia"}
+    {"id": "46", "op": "tts_prefetch", "text": "passage to pre-synthesize ..."}
+    {"id": "45", "op": "stt", "path": "/tmp/recording.wav", "timeout": 20}
+
+and each response line echoes the id:
+
+    {"id": "42", "ok": true, "result": {...}, "elapsed_ms": 3.1}
+    {"id": "43", "ok": false, "error": "Job timed out after 30s"}
+
+Usage:
+    python ml/worker.py --stdio [--workers N] [--timeout SECONDS]
+    python ml/worker.py --socket /tmp/ml_worker.sock [--workers N]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import signal
+import socketserver
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the current directory to Python path to find subfolders (nlp, speech, etc.)
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+DEFAULT_POOL_SIZE = int(os.environ.get('ML_WORKER_POOL', min(4, os.cpu_count() or 1)))
+DEFAULT_TIMEOUT = float(os.environ.get('ML_WORKER_TIMEOUT', 60))
+
+# Modules imported by each worker process before it accepts its first job
+PRELOAD_MODULES = ('nlp.reading_analysis', 'ocr.process_text', 'speech.recognition')
+
+
+# --- Job Handlers (run inside the worker process) ---
+def _run_analyze(job):
+    from nlp.reading_analysis import analyze_reading_content
+    return analyze_reading_content(job.get('text'), job.get('tokenizer'))
+
+
+def _run_ocr(job):
+    from ocr.process_text import extract_text_from_image
+    return extract_text_from_image(job.get('path', ''))
+
+
+def _run_ocr_batch(job):
+    from ocr.batch_ocr import ocr_documents
+    return ocr_documents(
+        job.get('paths') or [], workers=job.get('workers'), tile=job.get('tile', False)
+    )
+
+
+def _run_tts(job):
+    from speech.recognition import text_to_speech
+    filename = text_to_speech(
+        job.get('text') or "Hello, adaptive reading assistant.", job.get('lang', 'en'), job.get('voice')
+    )
+    if filename:
+        return {"success": True, "audio_filename": filename}
+    return {"success": False, "error": "TTS failed during generation."}
+
+
+def _run_tts_prefetch(job):
+    from speech.tts_cache import get_cache, presynthesize_passage
+    if job.get('words'):
+        clips = get_cache().presynthesize(job['words'], job.get('lang', 'en'), job.get('voice'))
+    else:
+        clips = presynthesize_passage(job.get('text') or '', job.get('lang', 'en'), job.get('voice'))
+    return {"success": True, "clips": clips}
+
+
+def _run_stt(job):
+    from speech.recognition import speech_to_text
+    if not job.get('path'):
+        return {"success": False, "error": "Missing audio file path for STT."}
+    return {"success": True, "transcription": speech_to_text(job['path'])}
+
+
+def _run_predict(job):
+    from nlp.word_prediction_model import get_next_word_prediction, prediction_count
+    try:
+        k = prediction_count(job.get('k', 3))
+    except ValueError as e:
+        return {"success": False, "error": f"Invalid request: {e}"}
+    return {"predictions": get_next_word_prediction(job.get('text') or '', k=k)}
+
+
+def _run_ping(job):
+    return {"pong": True, "pid": os.getpid()}
+
+
+def _run_stats(job):
+    from nlp.syllables import cache_stats
+    from speech.tts_cache import get_cache
+    return {"pid": os.getpid(), "syllables": cache_stats(), "tts_cache": get_cache().stats()}
+
+
+JOB_HANDLERS = {
+    'analyze': _run_analyze,
+    'ocr': _run_ocr,
+    'ocr_batch': _run_ocr_batch,
+    'tts': _run_tts,
+    'tts_prefetch': _run_tts_prefetch,
+    'stt': _run_stt,
+    'predict': _run_predict,
+    'ping': _run_ping,
+    'stats': _run_stats,
+}
+
+
+def run_job(job):
+    """Run a single job in the current process and return its raw result."""
+    handler = JOB_HANDLERS.get(job.get('op'))
+    if handler is None:
+        raise ValueError(f"Unknown op: {job.get('op')!r}")
+    return handler(job)
+
+
+def _error(job_id, message, **extra):
+    return {"id": job_id, "ok": False, "error": message, **extra}
+
+
+def handle_job(job):
+    """Run a job and wrap the result (or failure) in a response envelope."""
+    job_id = job.get('id')
+    started = time.perf_counter()
+    try:
+        result = run_job(job)
+    except Exception as e:
+        return _error(job_id, str(e), traceback=traceback.format_exc())
+    return {
+        "id": job_id,
+        "ok": True,
+        "result": result,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+def _preload(modules):
+    import importlib
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            # A missing optional backend (e.g. Tesseract bindings) must not
+            # take the whole worker down; its jobs will report the error.
+            print(f"⚠ Warning: Could not preload {name}: {e}", file=sys.stderr)
+
+
+def _worker_main(conn, preload):
+    """Worker process loop: receive a job, send back its response."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _preload(preload)
+    if preload:
+        import startup
+        startup.warm_up()
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):
+            break
+        if job is None:
+            break
+        conn.send(handle_job(job))
+
+
+# --- Worker Pool ---
+class _Worker:
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+
+    def stop(self, grace=1.0):
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(grace)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.conn.close()
+
+
+class WorkerPool:
+    """
+    Fixed-size pool of worker processes with per-job timeouts.
+
+    A worker that exceeds its job's timeout, or dies while running a job,
+    is killed and replaced so the pool always keeps `size` live workers.
+    """
+
+    def __init__(self, size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT, preload=PRELOAD_MODULES):
+        self.size = max(1, int(size))
+        self.timeout = timeout
+        self.preload = tuple(preload)
+        self.restarts = 0
+        self._ctx = multiprocessing.get_context('spawn')
+        self._idle = queue.Queue()
+        self._closed = False
+        for _ in range(self.size):
+            self._idle.put(self._spawn())
+
+    def _spawn(self):
+        parent_conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(
+            target=_worker_main, args=(child_conn, self.preload), daemon=True
+        )
+        process.start()
+        child_conn.close()
+        return _Worker(process, parent_conn)
+
+    def _replace(self, worker):
+        if worker.process.is_alive():
+            worker.process.kill()
+        worker.process.join()
+        worker.conn.close()
+        self.restarts += 1
+        return self._spawn()
+
+    def run(self, job):
+        """
+        Dispatch a job to the next idle worker and wait for its response.
+        The timeout counts from submission, so time spent waiting for a
+        free worker is part of it.
+        """
+        job_id = job.get('id')
+        if self._closed:
+            return _error(job_id, "Worker pool is shut down.")
+        timeout = float(job.get('timeout') or self.timeout)
+        deadline = time.monotonic() + timeout
+
+        try:
+            worker = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            return _error(job_id, f"Job timed out after {timeout:g}s waiting for a free worker")
+        try:
+            worker.conn.send(job)
+            if not worker.conn.poll(max(0.0, deadline - time.monotonic())):
+                worker = self._replace(worker)
+                return _error(job_id, f"Job timed out after {timeout:g}s")
+            return worker.conn.recv()
+        except (EOFError, OSError):
+            worker = self._replace(worker)
+            return _error(job_id, "Worker crashed while running job; restarted.")
+        finally:
+            self._idle.put(worker)
+
+    def close(self):
+        self._closed = True
+        for _ in range(self.size):
+            self._idle.get().stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# --- NDJSON Transport ---
+def _answer(pool, line):
+    try:
+        job = json.loads(line)
+        if not isinstance(job, dict):
+            raise ValueError("Request must be a JSON object.")
+    except ValueError as e:
+        return _error(None, f"Invalid request: {e}")
+    timeout = job.get('timeout')
+    if timeout is not None:
+        try:
+            if isinstance(timeout, bool) or float(timeout) <= 0:
+                raise ValueError()
+        except (TypeError, ValueError):
+            return _error(job.get('id'), "Invalid request: 'timeout' must be a positive number of seconds.")
+    return pool.run(job)
+
+
+def serve_stream(pool, infile, outfile):
+    """Serve requests line-by-line from `infile`, writing responses to `outfile`."""
+    write_lock = threading.Lock()
+
+    def respond(line):
+        try:
+            response = _answer(pool, line)
+        except Exception as e:
+            # Runs on an executor thread: an escaping exception would leave the client waiting
+            try:
+                job_id = json.loads(line).get('id')
+            except Exception:
+                job_id = None
+            response = _error(job_id, f"Internal worker error: {e}")
+        with write_lock:
+            outfile.write(json.dumps(response) + '\n')
+            outfile.flush()
+
+    with ThreadPoolExecutor(max_workers=pool.size) as executor:
+        for line in infile:
+            if line.strip():
+                executor.submit(respond, line)
+
+
+def serve_socket(pool, path):
+    """Serve the NDJSON protocol on a Unix domain socket at `path`."""
+    if os.path.exists(path):
+        os.unlink(path)
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            outfile = self.wfile
+            infile = (raw.decode('utf-8') for raw in self.rfile)
+            serve_stream(pool, infile, _SocketWriter(outfile))
+
+    class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+    with Server(path, Handler) as server:
+        print(f"🚀 ML worker listening on {path}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        finally:
+            os.unlink(path)
+
+
+class _SocketWriter:
+    """Text-mode adapter over a socket's binary write file."""
+
+    def __init__(self, wfile):
+        self._wfile = wfile
+
+    def write(self, text):
+        self._wfile.write(text.encode('utf-8'))
+
+    def flush(self):
+        self._wfile.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Persistent ML worker (NDJSON protocol).")
+    transport = parser.add_mutually_exclusive_group()
+    transport.add_argument('--stdio', action='store_true', help="Serve on stdin/stdout (default).")
+    transport.add_argument('--socket', metavar='PATH', help="Serve on a Unix domain socket.")
+    parser.add_argument('--workers', type=int, default=DEFAULT_POOL_SIZE, help="Number of worker processes.")
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT, help="Default per-job timeout in seconds.")
+    args = parser.parse_args(argv)
+
+    with WorkerPool(size=args.workers, timeout=args.timeout) as pool:
+        try:
+            if args.socket:
+                serve_socket(pool, args.socket)
+            else:
+                serve_stream(pool, sys.stdin, sys.stdout)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
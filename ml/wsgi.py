@@ -0,0 +1,25 @@
+# ml/wsgi.py
+"""
+WSGI entry point for production servers, e.g.:
+
+    waitress-serve --listen=0.0.0.0:5050 --call wsgi:create_app
+    gunicorn --chdir ml --threads 16 wsgi:application
+"""
+import os
+import sys
+
+# Add the current directory to Python path to find subfolders (nlp, speech, etc.)
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+import startup
+from api import app
+
+
+def create_app():
+    # Safe to call again (waitress --call imports this module, which already
+    # called it for `application`): warm-up only starts once per process
+    startup.start_warm_up(background=True)
+    return app
+
+
+application = create_app()